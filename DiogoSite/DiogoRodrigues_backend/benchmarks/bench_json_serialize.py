@@ -0,0 +1,69 @@
+"""
+Benchmark: original per-cell make_json_serializable vs the column-wise serializer.
+
+Run from DiogoRodrigues_backend/:
+    python -m benchmarks.bench_json_serialize [rows ...]
+
+The equivalence of both paths is checked in tests/test_json_serialize.py.
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify
+
+from src.utils.json_serialize import dataframe_to_records, json_response, make_json_serializable
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def build_frame(rows, seed=0):
+    """Wide frame shaped like LMU "Vehicle Telemetry" output from DuckDB .df()."""
+    rng = np.random.default_rng(seed)
+    ts = np.arange(rows) * 0.01
+    df = pd.DataFrame({
+        "ts": ts,
+        "Speed": rng.normal(180, 40, rows),
+        "Throttle": rng.random(rows),
+        "Brake": rng.random(rows),
+        "Steering": rng.normal(0, 0.2, rows),
+        "RPM": rng.integers(3000, 9000, rows),
+        "Gear": rng.integers(1, 7, rows).astype("int8"),
+        "InPits": rng.random(rows) < 0.01,
+        "when": pd.Timestamp("2025-01-01") + pd.to_timedelta(ts, unit="s"),
+    })
+    df.loc[::7, "Speed"] = np.nan
+    df.loc[::11, "when"] = pd.NaT
+    return df
+
+
+def old_path(df):
+    return make_json_serializable(df.to_dict("records"))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    app = Flask(__name__)
+    print(f"{'rows':>10} {'old (s)':>10} {'new (s)':>10} {'speed-up':>9} {'encode old':>11} {'encode new':>11}")
+    for rows in sizes:
+        df = build_frame(rows)
+        old, old_time = timed(old_path, df)
+        new, new_time = timed(dataframe_to_records, df)
+
+        with app.app_context():
+            _, old_encode = timed(jsonify, old)
+            _, new_encode = timed(json_response, new)
+
+        print(f"{rows:>10} {old_time:>10.3f} {new_time:>10.3f} {old_time / new_time:>8.1f}x "
+              f"{old_encode:>11.3f} {new_encode:>11.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -13,6 +13,7 @@ import time
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask import Flask, jsonify
 from flask_cors import CORS
+from src.utils.upload_store import is_session_sidecar, release_session, session_expired, session_path_for
 
 # ============================================================
 # LIMPEZA DE FICHEIROS AUTOMÁTICA
@@ -32,11 +33,21 @@ def cleanup_old_files():
 
         for filename in os.listdir(UPLOAD_FOLDER):
             filepath = os.path.join(UPLOAD_FOLDER, filename)
-            if os.path.isfile(filepath):
-                file_mod_time = os.path.getmtime(filepath)
-                if (now - file_mod_time) > retention_seconds:
+            if not os.path.isfile(filepath):
+                continue
+
+            # Os ficheiros auxiliares (resumo, referências) expiram junto com a sessão;
+            # só se apagam aqui se ficaram órfãos
+            if is_session_sidecar(filename):
+                if not os.path.exists(session_path_for(filepath)):
                     os.remove(filepath)
-                    logging.info(f"Ficheiro antigo removido: {filename}")
+                continue
+
+            # Um ficheiro enviado várias vezes só é apagado quando todas as referências expiram
+            if session_expired(filepath, now, retention_seconds):
+                # Fecha a ligação DuckDB em cache antes de apagar o ficheiro
+                release_session(filepath)
+                logging.info(f"Ficheiro antigo removido: {filename}")
     except Exception as e:
         logging.error(f"Erro durante a limpeza de ficheiros: {e}", exc_info=True)
 
@@ -50,7 +61,11 @@ def create_app():
 
    # CORS permitido para o site oficial E para o teu localhost (testes)
     CORS(app, resources={
-        r"/api/*": {"origins": ["https://diogorodrigues.pt", "http://localhost:5173"]}
+        r"/api/*": {
+            "origins": ["https://diogorodrigues.pt", "http://localhost:5173"],
+            # Cabeçalhos de resultado truncado do /api/telemetry/query
+            "expose_headers": ["X-Result-Truncated", "X-Result-Row-Limit"],
+        }
     })
 
     # BLUEPRINT (rotas de YouTube + Notícias)
@@ -74,6 +89,9 @@ app = create_app()
 # Inicia o agendador de limpeza que corre em background
 scheduler = BackgroundScheduler(daemon=True)
 scheduler.add_job(cleanup_old_files, 'interval', minutes=15)
+# Atualiza em background a cache do YouTube/notícias antes de os visitantes a verem expirada
+from src.youtube_routes import refresh_stale_cache
+scheduler.add_job(refresh_stale_cache, 'interval', minutes=1)
 scheduler.start()
 logging.info("Agendador de limpeza de ficheiros iniciado (intervalo: 15 min, retenção: 30 min).")
 
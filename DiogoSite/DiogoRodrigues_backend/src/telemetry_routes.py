@@ -1,42 +1,95 @@
+import json
 import os
 import duckdb
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from werkzeug.utils import secure_filename
-import uuid
-import numpy as np
-import pandas as pd
+from src.utils.analysis_jobs import TERMINAL_STATES, analysis_jobs, read_job
+from src.utils.downsample import DEFAULT_POINTS, downsample_channels, resolve_range
+from src.utils.duckdb_pool import telemetry_pool
+from src.utils.json_serialize import dataframe_to_records, json_response
+from src.utils.lap_compare import DEFAULT_DISTANCE_CHANNEL, DEFAULT_STEP_METERS, compare_laps
+from src.utils.query_cache import cache_key, query_result_cache
+from src.utils.query_governor import CappedResult, QueryLimitError, query_governor
+from src.utils.session_history import best_laps, history_enabled, history_overview, record_session
+from src.utils.session_summary import build_summary, cached_query_result, load_summary, write_summary
+from src.utils.stint_analysis import DEFAULT_OUTLIER_Z, DEFAULT_WINDOW, stint_analysis
+from src.utils.telemetry_laps import compute_laps, default_channels, lap_channel_stats, lap_report, resolve_channels
+from src.utils.telemetry_stream import STREAM_FORMATS, format_available, stream_result, uses_arrow
+from src.utils.upload_store import (
+    UploadError,
+    append_chunk,
+    chunked_upload_status,
+    finalize_chunked_upload,
+    init_chunked_upload,
+    store_upload,
+)
 
 telemetry_bp = Blueprint('telemetry_bp', __name__)
 
+# Delay before EventSource reconnects to ask for the next state
+JOB_EVENTS_RETRY_MS = 1000
+
 # Define a temporary folder for uploads
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'temp_uploads')
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-def format_time(total_seconds):
-    if not isinstance(total_seconds, (int, float)) or total_seconds < 0:
-        return '0:00.000'
-    minutes = int(total_seconds // 60)
-    seconds = total_seconds % 60
-    return f"{minutes}:{seconds:06.3f}"
-
-def make_json_serializable(data):
-    """Recursively converts numpy and pandas types to native Python types."""
-    if isinstance(data, dict):
-        return {key: make_json_serializable(value) for key, value in data.items()}
-    if isinstance(data, list):
-        return [make_json_serializable(element) for element in data]
-    if isinstance(data, (np.ndarray, pd.Series)):
-        return data.tolist()
-    if isinstance(data, np.integer):
-        return int(data)
-    if isinstance(data, np.floating):
-        return float(data)
-    if isinstance(data, (np.datetime64, np.timedelta64, pd.Timestamp)):
-        return str(data)
-    if pd.isna(data):
-        return None
-    return data
+def resolve_upload(filename):
+    """Returns the path of an uploaded session file, or None if it no longer exists."""
+    temp_filepath = os.path.join(UPLOAD_FOLDER, secure_filename(filename))
+    return temp_filepath if os.path.exists(temp_filepath) else None
+
+def analyze_session(temp_filepath, metadata=None):
+    """
+    Computes the lap list of an uploaded session and writes its summary sidecar
+    (catalog, schemas, previews, laps) so later catalog queries need no DuckDB work.
+    When the history store is enabled, the laps are also appended to it.
+    """
+    # Attach through the pool so the follow-up queries start with a warm connection
+    with telemetry_pool.connection(temp_filepath) as con:
+        calculated_laps = compute_laps(con)
+        write_summary(temp_filepath, build_summary(con, calculated_laps))
+        record_session(con, temp_filepath, calculated_laps, metadata)
+    return calculated_laps
+
+def session_metadata_from(source):
+    """Optional track/car/session type sent with an upload (form fields or JSON body)."""
+    return {key: source.get(key) for key in ('track', 'car', 'sessionType') if source.get(key)}
+
+def stored_session_laps(temp_filepath, already_present, metadata=None):
+    """Laps of a stored upload: from its summary when the file was already known, else analyzed now."""
+    summary = load_summary(temp_filepath) if already_present else None
+    if summary is not None:
+        return summary["laps"]
+    return analyze_session(temp_filepath, metadata)
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def is_number_list(value):
+    return isinstance(value, list) and all(is_number(item) for item in value)
+
+def is_integer_list(value):
+    return isinstance(value, list) and len(value) > 0 and all(is_integer(item) for item in value)
+
+def is_name(value):
+    return isinstance(value, str)
+
+def is_name_list(value):
+    return isinstance(value, list) and len(value) > 0 and all(is_name(item) for item in value)
+
+def invalid_field(data, **checks):
+    """
+    Message for the first field of `data` that is present but fails its check,
+    given as field=(predicate, description); None when all of them are fine.
+    """
+    for field, (check, description) in checks.items():
+        if data.get(field) is not None and not check(data[field]):
+            return f"{field} must be {description}"
+    return None
 
 @telemetry_bp.route('/telemetry/analyze', methods=['POST'])
 def analyze_telemetry():
@@ -49,55 +102,14 @@ def analyze_telemetry():
         return jsonify({"error": "No file selected"}), 400
 
     if file and file.filename.endswith('.duckdb'):
-        temp_filename = str(uuid.uuid4()) + '.duckdb'
-        temp_filepath = os.path.join(UPLOAD_FOLDER, temp_filename)
-        
         try:
-            file.save(temp_filepath)
+            # Stored under its content hash: the same session uploaded again is not re-analyzed
+            temp_filename, already_present = store_upload(file.stream, UPLOAD_FOLDER)
+            temp_filepath = os.path.join(UPLOAD_FOLDER, temp_filename)
             file_size_bytes = os.path.getsize(temp_filepath)
             current_app.logger.debug(f">>> File saved to: {temp_filepath}, Size: {file_size_bytes} bytes")
-            
-            con = duckdb.connect()
-            con.execute(f"ATTACH '{temp_filepath}' AS lmu (READ_ONLY, BLOCK_SIZE 16384);")
-            
-            # Get official lap times and lap start timestamps
-            official_times_query = 'SELECT value FROM lmu."Lap Time" ORDER BY ts'
-            official_times = [row[0] for row in con.execute(official_times_query).fetchall()]
-
-            lap_starts_query = 'SELECT ts FROM lmu.Lap ORDER BY ts'
-            lap_start_timestamps = [row[0] for row in con.execute(lap_starts_query).fetchall()]
-
-            calculated_laps = []
-            
-            # The number of calculable laps is one less than the number of lap start markers
-            num_laps = len(lap_start_timestamps) - 1
-
-            # Loop from 1 to skip the out-lap (i=0)
-            for i in range(1, num_laps):
-                # Lap number for display should start at 1 for the first flying lap
-                lap_number = i 
-                
-                # Get the official time, aligning with the loop index
-                official_time = official_times[i] if i < len(official_times) else 0.0
-
-                is_valid = official_time > 5
-
-                final_time = 0.0
-                if is_valid:
-                    final_time = official_time
-                else:
-                    # manual_time for lap i is the difference between start of lap i+1 and start of lap i
-                    manual_time = lap_start_timestamps[i+1] - lap_start_timestamps[i]
-                    final_time = manual_time
-                
-                calculated_laps.append({
-                    "lapNumber": lap_number,
-                    "timeSeconds": final_time,
-                    "formatted": format_time(final_time),
-                    "valid": is_valid
-                })
-
-            con.close()
+
+            calculated_laps = stored_session_laps(temp_filepath, already_present, session_metadata_from(request.form))
 
             response_data = {
                 "laps": calculated_laps,
@@ -115,6 +127,188 @@ def analyze_telemetry():
     return jsonify({"error": "Invalid file type. Please upload a .duckdb file"}), 400
 
 
+@telemetry_bp.route('/telemetry/jobs', methods=['POST'])
+def submit_analysis_job():
+    """
+    Stores the upload and analyzes it in the background. Returns 202 with the
+    job id (the file's content hash); poll /telemetry/jobs/<id> or stream
+    /telemetry/jobs/<id>/events for progress and the lap list.
+    """
+    file = request.files.get('telemetryFile')
+    if file is None or file.filename == '':
+        return jsonify({"error": "No file selected"}), 400
+    if not file.filename.endswith('.duckdb'):
+        return jsonify({"error": "Invalid file type. Please upload a .duckdb file"}), 400
+
+    try:
+        temp_filename, already_present = store_upload(file.stream, UPLOAD_FOLDER)
+        temp_filepath = os.path.join(UPLOAD_FOLDER, temp_filename)
+        summary = load_summary(temp_filepath) if already_present else None
+        job = analysis_jobs.submit(
+            temp_filepath,
+            session_metadata_from(request.form),
+            laps=summary["laps"] if summary is not None else None,
+        )
+        return jsonify({**job, "temp_filename": temp_filename}), 202
+    except Exception as e:
+        current_app.logger.error(f"Could not start analysis job: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+def resolve_job(job_id):
+    """(session file, job state) of a job, or (None, None) if unknown."""
+    if not analysis_jobs.valid_job_id(job_id):
+        return None, None
+    temp_filepath = analysis_jobs.session_file(UPLOAD_FOLDER, job_id)
+    return temp_filepath, read_job(temp_filepath)
+
+
+@telemetry_bp.route('/telemetry/jobs/<job_id>', methods=['GET'])
+def analysis_job_status(job_id):
+    _, job = resolve_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    return json_response(job)
+
+
+@telemetry_bp.route('/telemetry/jobs/<job_id>', methods=['DELETE'])
+def cancel_analysis_job(job_id):
+    temp_filepath, job = resolve_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    return json_response(analysis_jobs.cancel(temp_filepath))
+
+
+@telemetry_bp.route('/telemetry/jobs/<job_id>/events', methods=['GET'])
+def analysis_job_events(job_id):
+    """
+    Server-Sent Events without holding a worker: every request answers at once
+    with the job state (or nothing new, when it matches Last-Event-ID) and a
+    `retry:` hint, and EventSource reconnects for the next one. A job that no
+    longer exists gets a `gone` event, after which the client stops.
+    """
+    _, state = resolve_job(job_id)
+    if state is None:
+        body = f"event: gone\ndata: {json.dumps({'error': f'Job not found: {job_id}'})}\n\n"
+    elif str(state.get("updatedAt")) == request.headers.get('Last-Event-ID'):
+        # Nothing new: a comment keeps the response valid until the client retries
+        body = f"retry: {JOB_EVENTS_RETRY_MS}\n: no change\n\n"
+    else:
+        body = f"retry: {JOB_EVENTS_RETRY_MS}\nid: {state.get('updatedAt')}\ndata: {json.dumps(state)}\n\n"
+    response = current_app.response_class(body, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def upload_error_response(e):
+    return jsonify({"error": str(e), **e.details}), e.status
+
+
+@telemetry_bp.route('/telemetry/upload/init', methods=['POST'])
+def init_upload():
+    """Starts a chunked upload. Body: {filename, size, sha256 (optional)}."""
+    data = request.get_json() or {}
+    if not str(data.get('filename', '')).endswith('.duckdb'):
+        return jsonify({"error": "Invalid file type. Please upload a .duckdb file"}), 400
+    try:
+        return jsonify(init_chunked_upload(UPLOAD_FOLDER, data.get('size'), data.get('sha256')))
+    except UploadError as e:
+        return upload_error_response(e)
+
+
+@telemetry_bp.route('/telemetry/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Bytes received so far, used by clients to resume an interrupted upload."""
+    try:
+        return jsonify(chunked_upload_status(UPLOAD_FOLDER, upload_id))
+    except UploadError as e:
+        return upload_error_response(e)
+
+
+@telemetry_bp.route('/telemetry/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Appends the raw request body at `?offset=`. Optional `X-Chunk-SHA256` header."""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"error": "offset is required"}), 400
+    try:
+        return jsonify(append_chunk(UPLOAD_FOLDER, upload_id, offset, request.stream, request.headers.get('X-Chunk-SHA256')))
+    except UploadError as e:
+        return upload_error_response(e)
+
+
+@telemetry_bp.route('/telemetry/upload/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Verifies the assembled file and runs the same analysis as /telemetry/analyze."""
+    try:
+        temp_filename, already_present = finalize_chunked_upload(UPLOAD_FOLDER, upload_id)
+        temp_filepath = os.path.join(UPLOAD_FOLDER, temp_filename)
+        metadata = session_metadata_from(request.get_json(silent=True) or {})
+        calculated_laps = stored_session_laps(temp_filepath, already_present, metadata)
+        return jsonify({"laps": calculated_laps, "temp_filename": temp_filename})
+
+    except UploadError as e:
+        return upload_error_response(e)
+    except duckdb.Error as e:
+        return jsonify({"error": f"Database processing error: {e}"}), 500
+    except Exception as e:
+        current_app.logger.error(f"An unexpected error occurred during analysis: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+def negotiate_query_format(data):
+    """
+    Picks the output format of /telemetry/query: an explicit `format` in the
+    body wins, otherwise the Accept header. 'records' is the original
+    list-of-objects JSON response.
+    """
+    fmt = data.get('format')
+    if fmt:
+        return fmt
+    accepted = ['application/json'] + [mime for mime in STREAM_FORMATS.values() if mime != 'application/json']
+    best = request.accept_mimetypes.best_match(accepted, default='application/json')
+    for name, mime in STREAM_FORMATS.items():
+        if mime == best and mime != 'application/json':
+            return name
+    return 'records'
+
+
+def mark_truncated(response, row_limit=None):
+    """Adds the truncation headers when `row_limit` is set (the result was cut at that many rows)."""
+    if row_limit is not None:
+        response.headers['X-Result-Truncated'] = 'true'
+        response.headers['X-Result-Row-Limit'] = str(row_limit)
+    return response
+
+
+def records_response(body, row_limit=None):
+    """JSON response from already serialized bytes; `row_limit` marks a truncated result."""
+    return mark_truncated(current_app.response_class(body, mimetype='application/json'), row_limit)
+
+
+def governed_stream(temp_filepath, query, fmt):
+    """
+    Runs `query` under the query governor's slot and streaming limits and
+    yields the encoded result batch by batch, cut at `stream_max_rows` rows
+    as it is read. The first `next()` runs the query and yields nothing, so
+    busy, time-limit and SQL errors still become a JSON error response.
+    """
+    with query_governor.slot(), telemetry_pool.connection(temp_filepath) as con, \
+            query_governor.time_limit(con, query_governor.stream_timeout):
+        result = CappedResult(con.execute(query), query_governor.stream_max_rows, arrow=uses_arrow(fmt))
+        yield b""
+        yield from stream_result(result, fmt)
+
+
+def stream_telemetry_query(temp_filepath, query, fmt):
+    stream = governed_stream(temp_filepath, query, fmt)
+    next(stream)
+    response = current_app.response_class(stream_with_context(stream), mimetype=STREAM_FORMATS[fmt])
+    # Truncation is only known at the end, so the limit that applies is always announced
+    response.headers['X-Result-Row-Limit'] = str(query_governor.stream_max_rows)
+    return response
+
+
 @telemetry_bp.route('/telemetry/query', methods=['POST'])
 def query_telemetry():
     data = request.get_json()
@@ -124,27 +318,311 @@ def query_telemetry():
     if not filename or not query:
         return jsonify({"error": "Filename and query are required"}), 400
 
-    temp_filepath = os.path.join(UPLOAD_FOLDER, secure_filename(filename))
-    if not os.path.exists(temp_filepath):
+    fmt = negotiate_query_format(data)
+    if fmt != 'records' and fmt not in STREAM_FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    if not format_available(fmt):
+        return jsonify({"error": f"Format '{fmt}' requires pyarrow on the server"}), 406
+
+    temp_filepath = resolve_upload(filename)
+    if not temp_filepath:
         return jsonify({"error": f"File not found: {filename}"}), 404
     
     try:
-        con = duckdb.connect()
-        con.execute(f"ATTACH '{temp_filepath}' AS lmu (READ_ONLY, BLOCK_SIZE 16384);")
-        
-        result_data = con.execute(query).df()
-        con.close()
-
-        # The key fix: convert the DataFrame to a list of dicts
-        # and then clean it for JSON serialization.
-        result_list = result_data.to_dict('records')
-        serializable_result = make_json_serializable(result_list)
-        
-        return jsonify(serializable_result)
+        if fmt != 'records':
+            return stream_telemetry_query(temp_filepath, query, fmt)
+
+        # Repeated queries on the same file are served from their serialized bytes
+        key = cache_key(temp_filepath, query)
+        cached_body = query_result_cache.get(key) if key is not None else None
+        if cached_body is not None:
+            return records_response(*cached_body)
+
+        # Catalog, preview and schema queries are answered from the upload-time summary
+        row_limit = None
+        cached_result = cached_query_result(load_summary(temp_filepath), query)
+        if cached_result is not None:
+            response = json_response(cached_result)
+        else:
+            # Bounded concurrency, wall-clock limit and row cap for ad-hoc SQL
+            with query_governor.slot(), telemetry_pool.connection(temp_filepath) as con:
+                result_data, truncated = query_governor.fetch_capped_df(con, query)
+
+            # Convert column by column to a list of JSON-ready dicts
+            serializable_result = dataframe_to_records(result_data)
+            response = json_response(serializable_result)
+            if truncated:
+                row_limit = query_governor.max_rows
+
+        body = response.get_data()
+        if key is not None:
+            query_result_cache.set(key, (body, row_limit))
+        return records_response(body, row_limit)
     
+    except QueryLimitError as e:
+        return jsonify({"error": str(e)}), e.status
     except duckdb.Error as e:
         current_app.logger.error(f"Database query error: {e}", exc_info=True)
         return jsonify({"error": f"Database query error: {e}"}), 500
     except Exception as e:
         current_app.logger.error(f"An unexpected error occurred during query: {e}", exc_info=True)
-        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+@telemetry_bp.route('/telemetry/query/stats', methods=['GET'])
+def query_stats():
+    """Running, queued, rejected and timed-out ad-hoc queries, and result cache hits."""
+    return jsonify({"governor": query_governor.stats(), "resultCache": query_result_cache.stats()})
+
+
+@telemetry_bp.route('/telemetry/summary/<filename>', methods=['GET'])
+def session_summary(filename):
+    """Table catalog (row counts and schemas) and lap list computed at upload time."""
+    temp_filepath = resolve_upload(filename)
+    if not temp_filepath:
+        return jsonify({"error": f"File not found: {filename}"}), 404
+
+    summary = load_summary(temp_filepath)
+    if summary is None:
+        return jsonify({"error": f"No summary available for: {filename}"}), 404
+
+    tables = [
+        {"name": name, "rowCount": table["rowCount"], "schema": table["schema"]}
+        for name, table in summary["tables"].items()
+    ]
+    return json_response({"tables": tables, "laps": summary["laps"]})
+
+
+@telemetry_bp.route('/telemetry/laps/stats', methods=['POST'])
+def lap_stats():
+    """Per-lap aggregates (min, max, mean, percentiles) of the selected channels."""
+    data = request.get_json()
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({"error": "Filename is required"}), 400
+
+    error = invalid_field(
+        data,
+        channels=(is_name_list, "a non-empty list of channel names"),
+        percentiles=(is_number_list, "a list of numbers"),
+        laps=(is_integer_list, "a non-empty list of lap numbers"),
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    temp_filepath = resolve_upload(filename)
+    if not temp_filepath:
+        return jsonify({"error": f"File not found: {filename}"}), 404
+
+    try:
+        with telemetry_pool.connection(temp_filepath) as con:
+            channels = data.get('channels') or default_channels(con)
+            channels = resolve_channels(con, channels)
+            if not channels:
+                return jsonify({"error": "No channels selected"}), 400
+            laps = lap_channel_stats(con, channels, data.get('percentiles'), data.get('laps'))
+
+        return json_response({"channels": channels, "laps": laps})
+
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except duckdb.Error as e:
+        current_app.logger.error(f"Database query error: {e}", exc_info=True)
+        return jsonify({"error": f"Database query error: {e}"}), 500
+    except Exception as e:
+        current_app.logger.error(f"An unexpected error occurred during lap stats: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+@telemetry_bp.route('/telemetry/laps/report', methods=['POST'])
+def lap_report_route():
+    """Laps with sector splits and validity diagnostics, theoretical best and consistency."""
+    data = request.get_json()
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({"error": "Filename is required"}), 400
+
+    temp_filepath = resolve_upload(filename)
+    if not temp_filepath:
+        return jsonify({"error": f"File not found: {filename}"}), 404
+
+    try:
+        with telemetry_pool.connection(temp_filepath) as con:
+            report = lap_report(con)
+        return json_response(report)
+
+    except duckdb.Error as e:
+        current_app.logger.error(f"Database query error: {e}", exc_info=True)
+        return jsonify({"error": f"Database query error: {e}"}), 500
+    except Exception as e:
+        current_app.logger.error(f"An unexpected error occurred during lap report: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+@telemetry_bp.route('/telemetry/downsample', methods=['POST'])
+def downsample():
+    """
+    Chart-ready series of the selected channels over a time window (`start`/`end`)
+    or a lap, reduced to about `points` samples with LTTB or min/max buckets.
+    """
+    data = request.get_json()
+    filename = data.get('filename')
+    channels = data.get('channels')
+    if not filename or not channels:
+        return jsonify({"error": "Filename and channels are required"}), 400
+    error = invalid_field(
+        data,
+        channels=(is_name_list, "a non-empty list of channel names"),
+        points=(is_integer, "an integer"),
+        method=(is_name, "a string"),
+        lap=(is_integer, "a lap number"),
+        start=(is_number, "a number"),
+        end=(is_number, "a number"),
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    temp_filepath = resolve_upload(filename)
+    if not temp_filepath:
+        return jsonify({"error": f"File not found: {filename}"}), 404
+
+    try:
+        with telemetry_pool.connection(temp_filepath) as con:
+            channels = resolve_channels(con, channels)
+            start, end = resolve_range(con, data.get('start'), data.get('end'), data.get('lap'))
+            result = downsample_channels(
+                con, channels,
+                points=data.get('points', DEFAULT_POINTS),
+                method=data.get('method', 'lttb'),
+                start=start, end=end,
+            )
+
+        return json_response(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except duckdb.Error as e:
+        current_app.logger.error(f"Database query error: {e}", exc_info=True)
+        return jsonify({"error": f"Database query error: {e}"}), 500
+    except Exception as e:
+        current_app.logger.error(f"An unexpected error occurred during downsampling: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+@telemetry_bp.route('/telemetry/laps/compare', methods=['POST'])
+def lap_compare():
+    """
+    Aligns N laps on a common distance grid and returns delta-time and channel
+    overlays in columnar form. Results are memoized per file, laps and channels.
+    """
+    data = request.get_json()
+    filename = data.get('filename')
+    laps = data.get('laps')
+    if not filename or not laps:
+        return jsonify({"error": "Filename and laps are required"}), 400
+    error = invalid_field(
+        data,
+        laps=(is_integer_list, "a list of lap numbers"),
+        channels=(is_name_list, "a non-empty list of channel names"),
+        distanceChannel=(is_name, "a channel name"),
+        step=(is_number, "a number"),
+        reference=(is_integer, "a lap number"),
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    temp_filepath = resolve_upload(filename)
+    if not temp_filepath:
+        return jsonify({"error": f"File not found: {filename}"}), 404
+
+    distance_channel = data.get('distanceChannel', DEFAULT_DISTANCE_CHANNEL)
+    try:
+        with telemetry_pool.connection(temp_filepath) as con:
+            channels = data.get('channels') or default_channels(con)
+            resolve_channels(con, [distance_channel] + list(channels))
+            result = compare_laps(
+                con, temp_filepath, laps, channels,
+                distance_channel=distance_channel,
+                step=data.get('step', DEFAULT_STEP_METERS),
+                reference=data.get('reference'),
+            )
+
+        return json_response(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except duckdb.Error as e:
+        current_app.logger.error(f"Database query error: {e}", exc_info=True)
+        return jsonify({"error": f"Database query error: {e}"}), 500
+    except Exception as e:
+        current_app.logger.error(f"An unexpected error occurred during lap comparison: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+@telemetry_bp.route('/telemetry/stints', methods=['POST'])
+def stints():
+    """
+    Stints split at pit stops, with tyre degradation (s/lap), rolling
+    consistency and outlier laps. Results are memoized per file and options.
+    """
+    data = request.get_json()
+    filename = data.get('filename')
+    if not filename:
+        return jsonify({"error": "Filename is required"}), 400
+
+    temp_filepath = resolve_upload(filename)
+    if not temp_filepath:
+        return jsonify({"error": f"File not found: {filename}"}), 404
+
+    try:
+        with telemetry_pool.connection(temp_filepath) as con:
+            result = stint_analysis(
+                con, temp_filepath,
+                window=data.get('window', DEFAULT_WINDOW),
+                threshold=data.get('outlierThreshold', DEFAULT_OUTLIER_Z),
+            )
+
+        return json_response(result)
+
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except duckdb.Error as e:
+        current_app.logger.error(f"Database query error: {e}", exc_info=True)
+        return jsonify({"error": f"Database query error: {e}"}), 500
+    except Exception as e:
+        current_app.logger.error(f"An unexpected error occurred during stint analysis: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+
+@telemetry_bp.route('/telemetry/history', methods=['GET'])
+def telemetry_history():
+    """Per track/car overview of every session stored in the history (opt-in)."""
+    if not history_enabled():
+        return jsonify({"error": "Telemetry history is disabled"}), 404
+    try:
+        return json_response(history_overview(
+            track=request.args.get('track'),
+            car=request.args.get('car'),
+            days=request.args.get('days', type=int),
+        ))
+    except duckdb.Error as e:
+        current_app.logger.error(f"History query error: {e}", exc_info=True)
+        return jsonify({"error": f"History query error: {e}"}), 500
+
+
+@telemetry_bp.route('/telemetry/history/best-laps', methods=['GET'])
+def telemetry_history_best_laps():
+    """Fastest valid laps across stored sessions, filtered by track, car, session type and age."""
+    if not history_enabled():
+        return jsonify({"error": "Telemetry history is disabled"}), 404
+    try:
+        return json_response(best_laps(
+            track=request.args.get('track'),
+            car=request.args.get('car'),
+            days=request.args.get('days', type=int),
+            session_type=request.args.get('sessionType'),
+            limit=request.args.get('limit', 10, type=int),
+        ))
+    except duckdb.Error as e:
+        current_app.logger.error(f"History query error: {e}", exc_info=True)
+        return jsonify({"error": f"History query error: {e}"}), 500
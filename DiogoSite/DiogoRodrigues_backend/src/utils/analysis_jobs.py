@@ -0,0 +1,217 @@
+"""
+Background analysis of uploaded sessions in a bounded pool of processes.
+
+A job is identified by the content hash of its session file, so uploading
+the same file twice joins the existing job instead of starting another one.
+Its state lives in `<session file>.job.json`, which any gunicorn worker can
+read for status polling or the event stream:
+
+    queued -> running -> done | failed | timeout | cancelled
+
+The analysis itself (attach, laps, summary sidecar, history) runs in a
+separate process, so it never holds the GIL of the web worker. Each process
+gets the same DuckDB memory share as a pooled connection, out of the one
+TELEMETRY_POOL_MEMORY_LIMIT_MB budget (see duckdb_pool). A monitor
+thread in the worker that started the job relays progress from that
+process, enforces the time limit and honours cancel requests, which may come
+from any worker through the state file.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from queue import Empty
+
+from src.utils.duckdb_pool import JOB_WORKERS, POOL_THREADS, open_session, telemetry_pool
+from src.utils.session_history import record_session
+from src.utils.session_summary import build_summary, write_summary
+from src.utils.telemetry_laps import compute_laps
+from src.utils.upload_store import JOB_SUFFIX, SESSION_SUFFIX
+
+JOB_TIMEOUT_S = float(os.getenv("TELEMETRY_JOB_TIMEOUT_S", 300))
+TERMINAL_STATES = ("done", "failed", "timeout", "cancelled")
+_POLL_SECONDS = 0.25
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def job_path(filepath):
+    return filepath + JOB_SUFFIX
+
+
+def read_job(filepath):
+    try:
+        with open(job_path(filepath), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_job(filepath, state):
+    # Version of the state, used as the SSE event id
+    state["updatedAt"] = time.time()
+    path = job_path(filepath)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+def run_analysis(filepath, metadata, events, memory_limit_mb):
+    """Process entry point: the same work as analyze_session, reporting progress on `events`."""
+    try:
+        events.put(("progress", "attaching", 0.1))
+        con = open_session(filepath, memory_limit_mb, POOL_THREADS)
+        try:
+            events.put(("progress", "laps", 0.3))
+            laps = compute_laps(con)
+            events.put(("progress", "summary", 0.6))
+            write_summary(filepath, build_summary(con, laps))
+            events.put(("progress", "history", 0.9))
+            record_session(con, filepath, laps, metadata)
+        finally:
+            con.close()
+        events.put(("result", laps))
+    except Exception as e:
+        events.put(("error", str(e)))
+
+
+class AnalysisJobs:
+    def __init__(self, max_workers=JOB_WORKERS, timeout=JOB_TIMEOUT_S):
+        self.timeout = timeout
+        max_workers = max(1, max_workers)
+        # The pool already set aside a share of its budget for each job worker
+        self.memory_limit_mb = telemetry_pool.memory_limit_mb
+        # spawn: forking a worker that holds DuckDB and scheduler threads is not safe
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def valid_job_id(job_id):
+        return bool(_JOB_ID_RE.match(job_id or ""))
+
+    @staticmethod
+    def session_file(upload_folder, job_id):
+        return os.path.join(upload_folder, job_id + SESSION_SUFFIX)
+
+    def submit(self, filepath, metadata=None, laps=None):
+        """
+        Starts (or joins) the job for `filepath`. `laps` marks a session whose
+        analysis is already known, e.g. a repeated upload with a summary.
+        """
+        job_id = os.path.basename(filepath)[:-len(SESSION_SUFFIX)]
+        with self._lock:
+            state = read_job(filepath)
+            if state is not None and (
+                state["status"] == "done"
+                or (state["status"] not in TERMINAL_STATES and _pid_alive(state.get("ownerPid")))
+            ):
+                return state
+
+            now = time.time()
+            state = {"jobId": job_id, "status": "queued", "stage": None, "progress": 0.0,
+                     "createdAt": now, "ownerPid": os.getpid()}
+            if laps is not None:
+                state.update(status="done", progress=1.0, finishedAt=now, laps=laps)
+                _write_job(filepath, state)
+                return state
+            _write_job(filepath, state)
+
+        threading.Thread(
+            target=self._run, args=(filepath, metadata), name=f"analysis-{job_id[:8]}", daemon=True
+        ).start()
+        return state
+
+    def cancel(self, filepath):
+        """Asks for cancellation; the worker running the job stops it on its next check."""
+        with self._lock:
+            state = read_job(filepath)
+            if state is None or state["status"] in TERMINAL_STATES:
+                return state
+            state["cancelRequested"] = True
+            if state["status"] == "queued":
+                state.update(status="cancelled", finishedAt=time.time())
+            _write_job(filepath, state)
+            return state
+
+    def _update(self, filepath, **changes):
+        with self._lock:
+            state = read_job(filepath) or {}
+            state.update(changes)
+            _write_job(filepath, state)
+            return state
+
+    def _cancel_requested(self, filepath):
+        state = read_job(filepath)
+        return state is None or bool(state.get("cancelRequested"))
+
+    def _run(self, filepath, metadata):
+        with self._slots:
+            if self._cancel_requested(filepath):
+                return
+            events = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=run_analysis, args=(filepath, metadata, events, self.memory_limit_mb), daemon=True
+            )
+            process.start()
+            self._update(filepath, status="running", startedAt=time.time(), workerPid=process.pid)
+            try:
+                self._monitor(filepath, process, events)
+            except Exception as e:
+                logging.error(f"Analysis job monitor failed: {e}", exc_info=True)
+                self._update(filepath, status="failed", error=str(e), finishedAt=time.time())
+            finally:
+                if process.is_alive():
+                    process.terminate()
+                process.join(timeout=5)
+                events.close()
+
+    def _monitor(self, filepath, process, events):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            # Drain before checking liveness so a finished process never loses its result
+            while True:
+                try:
+                    kind, *payload = events.get_nowait()
+                except Empty:
+                    break
+                if kind == "progress":
+                    self._update(filepath, stage=payload[0], progress=payload[1])
+                elif kind == "result":
+                    self._update(filepath, status="done", stage=None, progress=1.0,
+                                 laps=payload[0], finishedAt=time.time())
+                    return
+                elif kind == "error":
+                    self._update(filepath, status="failed", error=payload[0], finishedAt=time.time())
+                    return
+
+            if not process.is_alive() and events.empty():
+                self._update(filepath, status="failed", finishedAt=time.time(),
+                             error=f"Analysis process exited with code {process.exitcode}")
+                return
+            if self._cancel_requested(filepath):
+                process.terminate()
+                self._update(filepath, status="cancelled", finishedAt=time.time())
+                return
+            if time.monotonic() > deadline:
+                process.terminate()
+                self._update(filepath, status="timeout", finishedAt=time.time(),
+                             error=f"Analysis exceeded the {self.timeout:g} s time limit")
+                return
+            time.sleep(_POLL_SECONDS)
+
+
+analysis_jobs = AnalysisJobs()
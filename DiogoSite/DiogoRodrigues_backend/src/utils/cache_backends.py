@@ -0,0 +1,151 @@
+"""
+Onde a cache do YouTube e das notícias guarda os dados.
+
+   - memory: dicionário no processo (cada worker tem a sua cópia, perde-se ao reiniciar).
+   - sqlite: ficheiro local partilhado por todos os workers e que sobrevive a reinícios.
+   - redis:  servidor Redis (opcional, precisa do pacote `redis`).
+
+Escolhe-se com CACHE_BACKEND. Se o backend pedido não estiver disponível,
+usa-se a memória e fica registado um aviso.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite").lower()
+CACHE_SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH", os.path.join(os.getcwd(), "cache_data", "youtube_cache.sqlite3")
+)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = "diogosite:cache:"
+
+
+class CacheBackend:
+    """Interface: guarda (data, last_updated) por chave. `data` tem de ser serializável em JSON."""
+
+    name = "base"
+
+    def get(self, key):
+        """Devolve (data, last_updated) ou None."""
+        raise NotImplementedError
+
+    def set(self, key, data, last_updated=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, data, last_updated=None):
+        with self._lock:
+            self._entries[key] = (data, last_updated or time.time())
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteBackend(CacheBackend):
+    name = "sqlite"
+
+    def __init__(self, path=CACHE_SQLITE_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._local = threading.local()
+        con = self._connection()
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, data TEXT NOT NULL, last_updated REAL NOT NULL)"
+        )
+        con.commit()
+
+    def _connection(self):
+        # Uma ligação por thread (o sqlite3 não partilha ligações entre threads)
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=5)
+            self._local.con = con
+        return con
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT data, last_updated FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, data, last_updated=None):
+        con = self._connection()
+        con.execute(
+            "INSERT OR REPLACE INTO cache (key, data, last_updated) VALUES (?, ?, ?)",
+            (key, json.dumps(data), last_updated or time.time()),
+        )
+        con.commit()
+
+    def delete(self, key):
+        con = self._connection()
+        con.execute("DELETE FROM cache WHERE key = ?", (key,))
+        con.commit()
+
+
+class RedisBackend(CacheBackend):
+    """
+    `client` é qualquer objeto com get/set/delete como o redis.Redis
+    (nos testes pode ser um substituto local em memória).
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None, url=REDIS_URL, prefix=REDIS_PREFIX):
+        if client is None:
+            import redis  # opcional: só é preciso com CACHE_BACKEND=redis
+            client = redis.Redis.from_url(url)
+            client.ping()
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["data"], entry["last_updated"]
+
+    def set(self, key, data, last_updated=None):
+        entry = {"data": data, "last_updated": last_updated or time.time()}
+        self.client.set(self.prefix + key, json.dumps(entry))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def create_backend(kind=CACHE_BACKEND):
+    """Cria o backend configurado; em caso de erro volta à memória."""
+    try:
+        if kind == "sqlite":
+            return SQLiteBackend()
+        if kind == "redis":
+            return RedisBackend()
+        if kind != "memory":
+            logging.warning(f"CACHE_BACKEND desconhecido: '{kind}'. A usar memória.")
+    except Exception as e:
+        logging.warning(f"Backend de cache '{kind}' indisponível ({e}). A usar memória.")
+    return MemoryBackend()
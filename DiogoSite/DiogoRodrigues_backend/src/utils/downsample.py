@@ -0,0 +1,132 @@
+"""
+Shape-preserving downsampling of telemetry channels for charts.
+
+- 'minmax': DuckDB buckets the time range and keeps the minimum and the
+  maximum sample of every bucket, so braking and steering peaks survive.
+- 'lttb': Largest-Triangle-Three-Buckets on the raw samples, in NumPy.
+"""
+
+import numpy as np
+
+from src.utils.telemetry_laps import LAP_INDEX_SQL, quote_ident
+
+DEFAULT_POINTS = 2000
+MAX_POINTS = 20000
+METHODS = ('lttb', 'minmax')
+
+
+def resolve_range(con, start=None, end=None, lap=None):
+    """Time window to sample: an explicit [start, end) or the span of a lap."""
+    if lap is not None:
+        row = con.execute(
+            f"SELECT lap_start, lap_end FROM ({LAP_INDEX_SQL}) WHERE lap = ?", [int(lap)]
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Lap not found: {lap}")
+        return row[0], row[1]
+    return start, end
+
+
+def _where(start, end):
+    clauses = ["value IS NOT NULL", "NOT isnan(value::DOUBLE)"]
+    params = []
+    if start is not None:
+        clauses.append("ts >= ?")
+        params.append(float(start))
+    if end is not None:
+        clauses.append("ts < ?")
+        params.append(float(end))
+    return " AND ".join(clauses), params
+
+
+def minmax_series(con, channel, points, start=None, end=None):
+    """Min and max sample of each of `points // 2` equal time buckets, in time order."""
+    where, params = _where(start, end)
+    relation = f"SELECT ts, value::DOUBLE AS value FROM lmu.{quote_ident(channel)} WHERE {where}"
+    buckets = max(1, points // 2)
+    result = con.execute(
+        f"""
+        WITH s AS ({relation}),
+        bounds AS (SELECT min(ts) AS t0, greatest(max(ts) - min(ts), 1e-9) AS span, count(*) AS n FROM s),
+        b AS (
+            SELECT least(floor((s.ts - bounds.t0) / bounds.span * {buckets}), {buckets - 1})::BIGINT AS bucket,
+                   s.ts, s.value
+            FROM s, bounds
+        ),
+        agg AS (
+            SELECT bucket,
+                   arg_min(ts, value) AS min_ts, min(value) AS min_value,
+                   arg_max(ts, value) AS max_ts, max(value) AS max_value
+            FROM b GROUP BY bucket
+        ),
+        pts AS (
+            SELECT min_ts AS ts, min_value AS value FROM agg
+            UNION
+            SELECT max_ts, max_value FROM agg
+        )
+        SELECT ts, value, (SELECT n FROM bounds) AS n FROM pts ORDER BY ts
+        """,
+        params,
+    ).fetchnumpy()
+    raw_count = int(result["n"][0]) if len(result["n"]) else 0
+    return result["ts"], result["value"], raw_count
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    starts = edges[:-1]
+    # Bucket averages, used as the third vertex of the previous bucket's triangle
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / np.maximum(counts, 1)
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / np.maximum(counts, 1)
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if hi <= lo:
+            hi = lo + 1
+        if i + 1 < n_out - 2:
+            cx, cy = avg_x[i + 1], avg_y[i + 1]
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def lttb_series(con, channel, points, start=None, end=None):
+    where, params = _where(start, end)
+    result = con.execute(
+        f"SELECT ts::DOUBLE AS ts, value::DOUBLE AS value FROM lmu.{quote_ident(channel)} WHERE {where} ORDER BY ts",
+        params,
+    ).fetchnumpy()
+    x, y = np.asarray(result["ts"]), np.asarray(result["value"])
+    keep = lttb_indices(x, y, points)
+    return x[keep], y[keep], len(x)
+
+
+def downsample_channels(con, channels, points=DEFAULT_POINTS, method='lttb', start=None, end=None):
+    """Columnar {channel: {ts: [...], value: [...], rawCount}} for the requested window."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}. Use one of: {', '.join(METHODS)}")
+    points = max(3, min(int(points), MAX_POINTS))
+    sampler = lttb_series if method == 'lttb' else minmax_series
+
+    series = {}
+    for channel in channels:
+        ts, values, raw_count = sampler(con, channel, points, start, end)
+        series[channel] = {
+            "ts": np.asarray(ts, dtype=float).tolist(),
+            "value": np.asarray(values, dtype=float).tolist(),
+            "rawCount": raw_count,
+        }
+    return {"method": method, "points": points, "start": start, "end": end, "channels": series}
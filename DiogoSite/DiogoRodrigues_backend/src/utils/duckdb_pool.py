@@ -0,0 +1,131 @@
+"""
+Pool of DuckDB connections with an uploaded telemetry file already attached.
+
+Each entry is an in-memory DuckDB database with the session file attached
+as `lmu` (READ_ONLY). Queries run on a cursor of that database, so they share
+the catalog and the buffer pool of the entry but never the same connection
+object between threads.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import duckdb
+
+POOL_MAX_CONNECTIONS = int(os.getenv("TELEMETRY_POOL_MAX_CONNECTIONS", 4))
+# Total memory budget (MB) shared by every attached session
+POOL_MEMORY_LIMIT_MB = int(os.getenv("TELEMETRY_POOL_MEMORY_LIMIT_MB", 1024))
+# Worker threads per attached session, so one heavy query cannot take every core
+POOL_THREADS = int(os.getenv("TELEMETRY_POOL_THREADS", 2))
+# Background analysis processes (analysis_jobs); each opens its own session from the same budget
+JOB_WORKERS = int(os.getenv("TELEMETRY_JOB_WORKERS", 2))
+
+
+def open_session(filepath, memory_limit_mb, threads):
+    """New in-memory DuckDB database with `filepath` attached as `lmu` (READ_ONLY)."""
+    con = duckdb.connect()
+    try:
+        con.execute(f"SET memory_limit = '{memory_limit_mb}MB';")
+        con.execute(f"SET threads = {threads};")
+        con.execute(f"ATTACH '{filepath}' AS lmu (READ_ONLY, BLOCK_SIZE 16384);")
+    except Exception:
+        con.close()
+        raise
+    return con
+
+
+class _PoolEntry:
+    def __init__(self, con):
+        self.con = con
+        self.in_use = 0
+        self.evicted = False
+
+
+class DuckDBPool:
+    """Bounded, thread-safe LRU of attached DuckDB connections keyed by file path."""
+
+    def __init__(self, max_connections=POOL_MAX_CONNECTIONS, memory_limit_mb=POOL_MEMORY_LIMIT_MB,
+                 threads=POOL_THREADS, job_sessions=JOB_WORKERS):
+        self.max_connections = max(1, max_connections)
+        self.threads = max(1, threads)
+        # Each connection and each analysis job gets an equal share, so together they stay under the cap
+        self.memory_limit_mb = max(64, memory_limit_mb // (self.max_connections + max(0, job_sessions)))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _open(self, filepath):
+        return open_session(filepath, self.memory_limit_mb, self.threads)
+
+    def _retire(self, key, entry):
+        """Marks an entry as evicted and closes it if nobody is using it."""
+        entry.evicted = True
+        if entry.in_use == 0:
+            entry.con.close()
+            logging.info(f"Closed pooled DuckDB connection: {os.path.basename(key)}")
+
+    def _acquire(self, filepath):
+        key = os.path.abspath(filepath)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.in_use += 1
+                return key, entry
+
+        # Attach outside the lock so a slow file does not block other sessions
+        con = self._open(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Another thread attached the same file in the meantime
+                con.close()
+            else:
+                entry = _PoolEntry(con)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_connections:
+                    old_key, old_entry = self._entries.popitem(last=False)
+                    self._retire(old_key, old_entry)
+            self._entries.move_to_end(key)
+            entry.in_use += 1
+            return key, entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.in_use -= 1
+            if entry.evicted and entry.in_use == 0:
+                entry.con.close()
+
+    @contextmanager
+    def connection(self, filepath):
+        """Yields a cursor on the pooled database that has `filepath` attached as `lmu`."""
+        key, entry = self._acquire(filepath)
+        cursor = None
+        try:
+            with self._lock:
+                cursor = entry.con.cursor()
+            yield cursor
+        finally:
+            if cursor is not None:
+                cursor.close()
+            self._release(entry)
+
+    def close(self, filepath):
+        """Closes the pooled connection for `filepath`, if any. Must run before deleting the file."""
+        key = os.path.abspath(filepath)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._retire(key, entry)
+
+    def close_all(self):
+        with self._lock:
+            while self._entries:
+                key, entry = self._entries.popitem(last=False)
+                self._retire(key, entry)
+
+
+telemetry_pool = DuckDBPool()
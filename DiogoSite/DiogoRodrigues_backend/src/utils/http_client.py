@@ -0,0 +1,166 @@
+"""
+Cliente HTTP partilhado para as APIs externas (YouTube, feeds RSS).
+
+- Uma requests.Session com pool de ligações: reaproveita TCP/TLS (keep-alive)
+  em vez de um handshake novo por pedido.
+- Retry com backoff exponencial em 429 e 5xx (respeita o Retry-After).
+- Pedidos condicionais (ETag / If-None-Match): se o recurso não mudou, a
+  resposta é um 304 e devolve-se o corpo guardado.
+- Métricas por chamada (tempo, erros, 304s), agrupadas por nome.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import exceptions as urllib3_exceptions
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = 10
+POOL_CONNECTIONS = 10   # Número de hosts diferentes com pool
+POOL_MAXSIZE = 20       # Ligações abertas por host (>= threads do gunicorn)
+MAX_ETAG_ENTRIES = 256
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _build_session(retries=3):
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,  # 0.5s, 1s, 2s
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({"User-Agent": "DiogoSite-Backend/1.0"})
+    return s
+
+
+session = _build_session()
+# Para fontes em que a próxima atualização já serve de retry (ex: feeds RSS com prazo)
+single_try_session = _build_session(retries=0)
+
+# ============================================================
+# 📊 MÉTRICAS
+# ============================================================
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+def _record(name, elapsed_ms, status=None, error=False):
+    with _metrics_lock:
+        m = _metrics.setdefault(name, {
+            "calls": 0, "errors": 0, "notModified": 0,
+            "totalMs": 0.0, "maxMs": 0.0, "lastMs": 0.0, "lastStatus": None,
+        })
+        m["calls"] += 1
+        m["errors"] += int(error)
+        m["notModified"] += int(status == 304)
+        m["totalMs"] += elapsed_ms
+        m["maxMs"] = max(m["maxMs"], elapsed_ms)
+        m["lastMs"] = elapsed_ms
+        m["lastStatus"] = status
+    logging.debug(f"HTTP {name}: {status} em {elapsed_ms:.0f} ms")
+
+
+def metrics():
+    """Resumo por nome de chamada: nº de chamadas, erros, 304s e tempos (ms)."""
+    with _metrics_lock:
+        return {
+            name: {**m, "avgMs": round(m["totalMs"] / m["calls"], 1) if m["calls"] else 0.0,
+                   "totalMs": round(m["totalMs"], 1), "maxMs": round(m["maxMs"], 1), "lastMs": round(m["lastMs"], 1)}
+            for name, m in _metrics.items()
+        }
+
+
+# ============================================================
+# 🌐 PEDIDOS
+# ============================================================
+_etag_lock = threading.Lock()
+_etag_cache = OrderedDict()  # (url, params) -> (etag, json)
+
+
+def get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, name=None, retry=True):
+    """GET pela sessão partilhada, com métricas. Devolve o requests.Response."""
+    name = name or url
+    start = time.perf_counter()
+    try:
+        response = (session if retry else single_try_session).get(url, params=params, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        _record(name, (time.perf_counter() - start) * 1000, error=True)
+        raise
+    _record(name, (time.perf_counter() - start) * 1000, response.status_code, error=response.status_code >= 400)
+    return response
+
+
+def get_bounded(url, headers=None, timeout=DEFAULT_TIMEOUT, deadline=None, max_bytes=None, name=None):
+    """
+    GET sem retries com prazo total. `timeout` limita cada leitura do socket
+    (um servidor que manda o corpo aos bocadinhos nunca o atinge); `deadline`
+    limita o pedido inteiro e é verificado entre leituras, e `max_bytes` o
+    tamanho do corpo. Devolve (response, corpo em bytes).
+    """
+    name = name or url
+    start = time.perf_counter()
+    try:
+        response = single_try_session.get(url, headers=headers, timeout=timeout, stream=True)
+        try:
+            # read1 devolve o que já chegou em vez de esperar pelo bloco inteiro
+            read = getattr(response.raw, "read1", None) or response.raw.read
+            chunks, size = [], 0
+            while True:
+                if deadline is not None and time.perf_counter() - start > deadline:
+                    raise requests.Timeout(f"Sem resposta completa em {deadline:g} s")
+                chunk = read(READ_CHUNK_SIZE, decode_content=True)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise requests.RequestException(f"Resposta maior do que {max_bytes} bytes")
+                chunks.append(chunk)
+        finally:
+            response.close()
+    except (requests.RequestException, urllib3_exceptions.HTTPError) as e:
+        _record(name, (time.perf_counter() - start) * 1000, error=True)
+        if isinstance(e, requests.RequestException):
+            raise
+        raise requests.ConnectionError(e) from e
+    _record(name, (time.perf_counter() - start) * 1000, response.status_code, error=response.status_code >= 400)
+    return response, b"".join(chunks)
+
+
+def get_json(url, params=None, timeout=DEFAULT_TIMEOUT, name=None, cache_key_params=None):
+    """
+    GET condicional de um recurso JSON. `cache_key_params` são os parâmetros
+    que identificam o recurso (sem chaves de API); por omissão, todos.
+    """
+    identity = (url, tuple(sorted((cache_key_params if cache_key_params is not None else params or {}).items())))
+    with _etag_lock:
+        cached = _etag_cache.get(identity)
+
+    headers = {"If-None-Match": cached[0]} if cached else None
+    response = get(url, params=params, headers=headers, timeout=timeout, name=name)
+
+    if response.status_code == 304 and cached:
+        with _etag_lock:
+            if identity in _etag_cache:
+                _etag_cache.move_to_end(identity)
+        return cached[1]
+
+    response.raise_for_status()
+    data = response.json()
+    etag = response.headers.get("ETag")
+    if etag:
+        with _etag_lock:
+            _etag_cache[identity] = (etag, data)
+            _etag_cache.move_to_end(identity)
+            while len(_etag_cache) > MAX_ETAG_ENTRIES:
+                _etag_cache.popitem(last=False)
+    return data
@@ -0,0 +1,157 @@
+"""
+JSON conversion of DuckDB/pandas query results.
+
+`make_json_serializable` is the original per-value converter. The
+`dataframe_to_*` helpers produce the same output for a whole DataFrame, but
+convert one column at a time based on its dtype, which keeps the per-cell
+work in numpy instead of Python `isinstance` chains.
+"""
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from flask import current_app, jsonify
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up
+    orjson = None
+
+
+def make_json_serializable(data):
+    """Recursively converts numpy and pandas types to native Python types."""
+    if isinstance(data, dict):
+        return {key: make_json_serializable(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [make_json_serializable(element) for element in data]
+    if isinstance(data, (np.ndarray, pd.Series)):
+        return data.tolist()
+    if isinstance(data, np.integer):
+        return int(data)
+    if isinstance(data, np.floating):
+        return float(data)
+    if isinstance(data, (np.datetime64, np.timedelta64, pd.Timestamp)):
+        return str(data)
+    if pd.isna(data):
+        return None
+    return data
+
+
+def _format_timestamps(series):
+    """Bulk equivalent of `str(pd.Timestamp)` for a datetime64 column, NaT -> None."""
+    if series.dt.tz is not None:
+        return [None if pd.isna(value) else str(value) for value in series]
+
+    try:
+        values = series.to_numpy(dtype='datetime64[ns]')
+    except (OverflowError, pd.errors.OutOfBoundsDatetime):
+        return [None if pd.isna(value) else str(value) for value in series]
+    missing = np.isnat(values)
+    nanos = values.view('int64') % 1_000_000_000
+
+    # str(Timestamp) drops the fraction when it is zero and only shows nanoseconds when present
+    seconds = np.datetime_as_string(values, unit='s')
+    micros = np.datetime_as_string(values, unit='us')
+    text = np.where(nanos == 0, seconds, micros)
+    text = np.char.replace(text.astype(str), 'T', ' ')
+
+    out = text.astype(object)
+    with_nanos = (nanos % 1000 != 0) & ~missing
+    if with_nanos.any():
+        for idx in np.flatnonzero(with_nanos):
+            out[idx] = str(pd.Timestamp(values[idx]))
+    out[missing] = None
+    return out.tolist()
+
+
+def serialize_column(series):
+    """Converts one DataFrame column to a list of JSON-ready Python values."""
+    dtype = series.dtype
+
+    if isinstance(dtype, np.dtype):
+        if dtype.kind == 'f':
+            values = series.to_numpy()
+            out = values.astype(object)
+            out[np.isnan(values)] = None
+            return out.tolist()
+        if dtype.kind in 'iub':
+            return series.tolist()
+        if dtype.kind == 'M':
+            return _format_timestamps(series)
+        if dtype.kind == 'm':
+            return [None if pd.isna(value) else str(value) for value in series]
+    elif isinstance(dtype, pd.DatetimeTZDtype):
+        return _format_timestamps(series)
+
+    # Object and extension dtypes (nullable ints/bools, strings, nested values)
+    return [make_json_serializable(value) for value in series.astype(object).tolist()]
+
+
+def dataframe_to_columns(df):
+    """Column-oriented form: {column: [values...]}."""
+    return {name: serialize_column(df[name]) for name in df.columns}
+
+
+def dataframe_to_records(df):
+    """Same result as `make_json_serializable(df.to_dict('records'))`."""
+    names = list(df.columns)
+    columns = [serialize_column(df.iloc[:, idx]) for idx in range(len(names))]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _orjson_default(value):
+    """
+    Values orjson cannot encode natively: numpy/pandas scalars as in
+    make_json_serializable, everything else by jsonify's own rules (dates,
+    Decimal, UUID, dataclasses), which raise TypeError for unknown types.
+    """
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, (np.datetime64, np.timedelta64, pd.Timestamp)):
+        return str(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return current_app.json.default(value)
+
+
+def _finite_floats(value):
+    """Non-finite floats -> None, through nested dicts and lists (orjson does this itself)."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite_floats(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite_floats(item) for item in value]
+    return value
+
+
+def json_dumps(payload):
+    """
+    Compact JSON text for streamed bodies, keeping key order. Like
+    json_response, it uses orjson when installed and writes non-finite floats
+    as null, so every line or block is valid JSON.
+    """
+    if orjson is None:
+        return json.dumps(_finite_floats(payload), separators=(",", ":"), allow_nan=False, default=_orjson_default)
+    return orjson.dumps(payload, option=orjson.OPT_PASSTHROUGH_DATETIME, default=_orjson_default).decode("utf-8")
+
+
+def json_response(payload, status=200):
+    """
+    jsonify() equivalent that uses orjson when it is installed. Non-finite
+    floats are written as null (jsonify would emit the non-standard NaN token).
+    """
+    if orjson is None:
+        response = jsonify(payload)
+        response.status_code = status
+        return response
+    body = orjson.dumps(
+        payload,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        default=_orjson_default,
+    )
+    return current_app.response_class(body, status=status, mimetype='application/json')
@@ -0,0 +1,125 @@
+"""
+Distance-aligned comparison of several laps of one session.
+
+Every lap is resampled onto a common lap-distance grid: the time at each grid
+point comes from the distance channel, and every other channel is
+interpolated at those times. Delta-time is each lap's elapsed time minus the
+reference lap's at the same distance. Results are memoized per
+(file, laps, channels, distance channel, step).
+"""
+
+import numpy as np
+
+from src.utils.lru_cache import SessionLRUCache
+from src.utils.telemetry_laps import LAP_INDEX_SQL, quote_ident
+
+DEFAULT_DISTANCE_CHANNEL = "Lap Dist"
+DEFAULT_STEP_METERS = 5.0
+MIN_STEP_METERS = 0.5
+MAX_COMPARE_LAPS = 10
+
+compare_cache = SessionLRUCache("lap_compare", max_entries=32)
+
+
+def _lap_samples(con, channel, laps):
+    """(lap, ts, value) arrays of `channel` for the requested laps, sorted by lap then ts."""
+    result = con.execute(
+        f"""
+        WITH laps AS ({LAP_INDEX_SQL})
+        SELECT l.lap, s.ts::DOUBLE AS ts, s.value::DOUBLE AS value
+        FROM lmu.{quote_ident(channel)} s
+        ASOF JOIN laps l ON s.ts >= l.lap_start
+        WHERE l.lap IN (SELECT unnest(?::INTEGER[])) AND s.value IS NOT NULL
+        ORDER BY l.lap, s.ts
+        """,
+        [list(laps)],
+    ).fetchnumpy()
+    return np.asarray(result["lap"]), np.asarray(result["ts"]), np.asarray(result["value"])
+
+
+def _split_by_lap(lap_col, *columns):
+    """{lap: (col1, col2, ...)} from columns sorted by lap."""
+    laps, starts = np.unique(lap_col, return_index=True)
+    bounds = list(starts[1:]) + [len(lap_col)]
+    return {
+        int(lap): tuple(col[lo:hi] for col in columns)
+        for lap, lo, hi in zip(laps, starts, bounds)
+    }
+
+
+def _lap_starts(con, laps):
+    rows = con.execute(
+        f"SELECT lap, lap_start FROM ({LAP_INDEX_SQL}) WHERE lap IN (SELECT unnest(?::INTEGER[]))",
+        [list(laps)],
+    ).fetchall()
+    return {lap: start for lap, start in rows}
+
+
+def compare_laps(con, filepath, laps, channels, distance_channel=DEFAULT_DISTANCE_CHANNEL,
+                 step=DEFAULT_STEP_METERS, reference=None):
+    laps = [int(lap) for lap in laps]
+    if not 2 <= len(laps) <= MAX_COMPARE_LAPS:
+        raise ValueError(f"Select between 2 and {MAX_COMPARE_LAPS} laps to compare")
+    step = max(float(step), MIN_STEP_METERS)
+    reference = laps[0] if reference is None else int(reference)
+    if reference not in laps:
+        raise ValueError(f"Reference lap {reference} is not in the comparison")
+
+    key = compare_cache.session_key(filepath, tuple(laps), tuple(channels), distance_channel, step, reference)
+    cached = compare_cache.get(key)
+    if cached is not None:
+        return cached
+
+    starts = _lap_starts(con, laps)
+    missing = [lap for lap in laps if lap not in starts]
+    if missing:
+        raise ValueError(f"Laps not found: {', '.join(map(str, missing))}")
+
+    dist_by_lap = _split_by_lap(*_lap_samples(con, distance_channel, laps))
+    no_distance = [lap for lap in laps if lap not in dist_by_lap or len(dist_by_lap[lap][0]) < 2]
+    if no_distance:
+        raise ValueError(f"No '{distance_channel}' samples for laps: {', '.join(map(str, no_distance))}")
+
+    # Distance must increase with time for the inverse lookup; a lap is only as long as its farthest point
+    monotonic = {}
+    for lap in laps:
+        ts, dist = dist_by_lap[lap]
+        dist = np.maximum.accumulate(dist)
+        keep = np.concatenate(([True], np.diff(dist) > 0))
+        monotonic[lap] = (ts[keep], dist[keep])
+
+    covered = min(monotonic[lap][1][-1] for lap in laps)
+    start_dist = max(monotonic[lap][1][0] for lap in laps)
+    grid = np.arange(start_dist, covered, step)
+    if grid.size < 2:
+        raise ValueError("The selected laps do not share enough distance to compare")
+
+    # Time at each grid point, per lap
+    times = {lap: np.interp(grid, monotonic[lap][1], monotonic[lap][0]) for lap in laps}
+    elapsed = {lap: times[lap] - starts[lap] for lap in laps}
+
+    overlays = {lap: {} for lap in laps}
+    for channel in channels:
+        by_lap = _split_by_lap(*_lap_samples(con, channel, laps))
+        for lap in laps:
+            if lap in by_lap and len(by_lap[lap][0]):
+                ts, values = by_lap[lap]
+                overlays[lap][channel] = np.round(np.interp(times[lap], ts, values), 4).tolist()
+            else:
+                overlays[lap][channel] = None
+
+    result = {
+        "distance": np.round(grid, 2).tolist(),
+        "reference": reference,
+        "distanceChannel": distance_channel,
+        "laps": {
+            str(lap): {
+                "time": np.round(elapsed[lap], 4).tolist(),
+                "delta": np.round(elapsed[lap] - elapsed[reference], 4).tolist(),
+                "channels": overlays[lap],
+            }
+            for lap in laps
+        },
+    }
+    compare_cache.set(key, result)
+    return result
@@ -0,0 +1,84 @@
+"""
+Small thread-safe LRU cache for results derived from an uploaded session.
+
+Keys are tuples whose first element is the session file path. Every cache
+created with `SessionLRUCache` is registered, so `invalidate_session` drops
+the entries of a file from all of them when cleanup_old_files deletes it.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+_registry = []
+
+
+class SessionLRUCache:
+    def __init__(self, name, max_entries=64, max_bytes=None, sizeof=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Size of a value in bytes; only needed when max_bytes is set
+        self.sizeof = sizeof or (lambda value: 0)
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _registry.append(self)
+
+    @staticmethod
+    def session_key(filepath, *parts):
+        return (os.path.abspath(filepath),) + parts
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._sizes.pop(key)
+                del self._data[key]
+            self._data[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                old_key, _ = self._data.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+
+    def invalidate(self, filepath):
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [key for key in self._data if key[0] == path]:
+                del self._data[key]
+                self._bytes -= self._sizes.pop(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def invalidate_session(filepath):
+    """Drops every cached result derived from `filepath`."""
+    for cache in _registry:
+        cache.invalidate(filepath)
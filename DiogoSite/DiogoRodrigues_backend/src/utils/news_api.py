@@ -1,8 +1,36 @@
 import feedparser
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import html
+import threading
 import time
 import re
-import socket
+from src.utils import http_client, news_health, news_store
+
+# Cada feed tem um prazo total (ligação + corpo); o conjunto todo tem um prazo máximo.
+# O que chegar até ao prazo é servido, os feeds lentos ficam para a próxima.
+FEED_TIMEOUT = 8        # segundos por feed, no total
+FEED_SOCKET_TIMEOUT = (3, 3)  # (ligação, cada leitura): o excesso sobre FEED_TIMEOUT é no máximo uma leitura
+FETCH_DEADLINE = 12     # segundos para todos os feeds
+MAX_FEED_BYTES = 5 * 1024 * 1024
+MAX_ENTRIES_PER_FEED = 5
+DESCRIPTION_LENGTH = 200
+
+# Padrões compilados uma vez (correm para todas as entradas de todos os feeds)
+_TAG_RE = re.compile(r'<[^>]*>|<[^>]*$')  # tags, incluindo uma tag cortada no fim
+_WHITESPACE_RE = re.compile(r'\s+')
+_IMG_RE = re.compile(r'<img[^>]+src="([^"]+)"', re.IGNORECASE)
+
+# Entradas já normalizadas, por (fonte, id, data de atualização)
+MAX_NORMALIZED_ENTRIES = 1024
+_normalized = OrderedDict()
+_normalized_lock = threading.Lock()
+
+_feed_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rss")
+# Pedido ainda a decorrer de cada fonte: não se pede outra vez enquanto não acabar
+_in_flight = {}
+_in_flight_lock = threading.Lock()
 
 # ==============================================================================
 # LISTA DE FONTES (Filtrada para sites com RSS válidos e notícias reais)
@@ -87,85 +115,168 @@ def extract_thumbnail(entry):
         content = entry.summary
         
     if content and "<img" in content:
-        m = re.search(r'<img[^>]+src="([^"]+)"', content)
+        m = _IMG_RE.search(content)
         if m:
             return m.group(1)
             
     return None
 
-def clean_html(raw_html):
-    """Remove tags HTML simples para a descrição ficar limpa"""
-    cleanr = re.compile('<.*?>')
-    cleantext = re.sub(cleanr, '', raw_html)
-    return cleantext.replace("&nbsp;", " ").strip()
+def clean_html(raw_html, max_length=None):
+    """
+    Remove tags HTML e entidades para a descrição ficar limpa. Com `max_length`,
+    só limpa o início do texto (o suficiente para `max_length` caracteres) em
+    vez do artigo inteiro.
+    """
+    chunk = max_length * 4 if max_length else len(raw_html)
+    while True:
+        text = _TAG_RE.sub(" ", raw_html[:chunk])
+        text = _WHITESPACE_RE.sub(" ", html.unescape(text).replace("\xa0", " ")).strip()
+        # Pouco texto (muitas tags no início)? Alarga o pedaço até chegar ou acabar o HTML
+        if not max_length or len(text) >= max_length or chunk >= len(raw_html):
+            return text[:max_length] if max_length else text
+        chunk *= 4
 
 # ==============================================================================
-# FUNÇÃO PRINCIPAL
+# LEITURA DE UM FEED
 # ==============================================================================
-def get_simracing_news():
-    articles = []
-    
-    # Guarda o timeout original para restaurá-lo no final
-    original_timeout = socket.getdefaulttimeout()
-    # Define um timeout global de 10 segundos para todas as operações de rede
-    socket.setdefaulttimeout(10)
+def normalize_entry(source_name, entry):
+    """
+    Converte uma entrada do feed num artigo (imagem, descrição limpa e data).
+    O resultado fica memorizado por id da entrada: uma entrada que não mudou
+    não volta a ser processada.
+    """
+    key = (
+        source_name,
+        entry.get("id") or entry.get("link"),
+        entry.get("updated") or entry.get("published"),
+    )
+    with _normalized_lock:
+        if key in _normalized:
+            _normalized.move_to_end(key)
+            return _normalized[key]
+
+    # Limpeza da descrição
+    raw_summary = getattr(entry, "summary", "") or getattr(entry, "title", "")
 
+    # Timestamp seguro
+    pub_date = entry.get("published_parsed") or entry.get("updated_parsed") or time.gmtime()
+
+    article = {
+        "title": html.unescape(entry.title),
+        "url": entry.link,
+        "description": clean_html(raw_summary, DESCRIPTION_LENGTH) + "...",
+        "image": extract_thumbnail(entry),
+        "source": source_name,
+        "timestamp": time.mktime(pub_date)
+    }
+    with _normalized_lock:
+        _normalized[key] = article
+        while len(_normalized) > MAX_NORMALIZED_ENTRIES:
+            _normalized.popitem(last=False)
+    return article
+
+def parse_entries(source_name, feed):
+    """Converte as entradas recentes de um feed já lido em artigos."""
+    # Limite de segurança: 5 notícias por fonte para não encher de lixo
+    # FILTRO DE DATA antes de qualquer processamento
+    return [
+        normalize_entry(source_name, entry)
+        for entry in feed.entries[:MAX_ENTRIES_PER_FEED]
+        if is_recent(entry)
+    ]
+
+def fetch_feed(source_name, url):
+    """Lê um feed e regista o resultado (latência, erro) na saúde da fonte."""
+    start = time.perf_counter()
     try:
-        for source_name, url in FEEDS:
-            try:
-                feed = feedparser.parse(url)
-                
-                # Limite de segurança: 5 notícias por fonte para não encher de lixo
-                for entry in feed.entries[:5]: 
-                    
-                    # FILTRO DE DATA
-                    if not is_recent(entry):
-                        continue
-
-                    img = extract_thumbnail(entry)
-                    
-                    # Limpeza da descrição
-                    raw_summary = getattr(entry, "summary", "") or getattr(entry, "title", "")
-                    description = clean_html(raw_summary)[:200] + "..."
-                    
-                    # Timestamp seguro
-                    pub_date = entry.get("published_parsed") or entry.get("updated_parsed") or time.gmtime()
-                    timestamp = time.mktime(pub_date)
-
-                    articles.append({
-                        "title": entry.title,
-                        "url": entry.link,
-                        "description": description,
-                        "image": img,
-                        "source": source_name,
-                        "timestamp": timestamp
-                    })
-            except Exception as e:
-                # Se ocorrer um erro (incluindo timeout), regista e continua para o próximo feed
-                print(f"Erro ao ler feed {source_name}: {e}")
+        added = _fetch_feed(source_name, url)
+    except Exception as e:
+        news_health.record_failure(source_name, (time.perf_counter() - start) * 1000, e)
+        raise
+    news_health.record_success(source_name, (time.perf_counter() - start) * 1000)
+    return added
+
+def _fetch_feed(source_name, url):
+    """
+    Descarrega um feed pela sessão HTTP partilhada (timeout só deste pedido,
+    sem mexer no socket.setdefaulttimeout global) com GET condicional: se o
+    feed não mudou desde a última vez (304) não é processado outra vez.
+    Os artigos novos vão para o armazém. Devolve quantos foram acrescentados.
+    """
+    etag, modified = news_store.feed_validators(source_name)
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+
+    # Sem retries: com o prazo global, um feed com erro espera pela próxima atualização.
+    # O prazo é do pedido inteiro, para um feed que manda o corpo devagar não prender a thread.
+    response, body = http_client.get_bounded(
+        url, headers=headers, timeout=FEED_SOCKET_TIMEOUT, deadline=FEED_TIMEOUT,
+        max_bytes=MAX_FEED_BYTES, name=f"rss.{source_name}",
+    )
+    if response.status_code == 304:
+        news_store.save_feed_state(source_name, url, None, None, changed=False)
+        return 0
+    response.raise_for_status()
+
+    added = news_store.add_articles(parse_entries(source_name, feedparser.parse(body)))
+    news_store.save_feed_state(
+        source_name, url, response.headers.get("ETag"), response.headers.get("Last-Modified"), changed=added > 0
+    )
+    return added
+
+# ==============================================================================
+# FUNÇÃO PRINCIPAL
+# ==============================================================================
+def refresh_feeds():
+    """
+    Pede, em paralelo, os feeds que estão na hora (polling adaptativo) e cujo
+    circuit breaker não está aberto. Espera no máximo FETCH_DEADLINE segundos.
+    Uma fonte cujo pedido anterior ainda não acabou não é pedida outra vez.
+    """
+    now = time.time()
+    due = [(source_name, url) for source_name, url in FEEDS if news_health.should_fetch(source_name, now)]
+    futures = {}
+    with _in_flight_lock:
+        for source_name, url in due:
+            running = _in_flight.get(source_name)
+            if running is not None and not running.done():
                 continue
-    finally:
-        # Restaura o timeout original para não afetar outras partes da aplicação
-        socket.setdefaulttimeout(original_timeout)
-
-    # Ordenar por data (mais recente primeiro)
-    articles.sort(key=lambda x: x["timestamp"], reverse=True)
-
-    # Remover duplicados (pelo título)
-    seen_titles = set()
-    unique_articles = []
-    for art in articles:
-        # Normaliza o título para evitar duplicados com pequenas diferenças
-        normalized_title = art["title"].lower().strip()
-        if normalized_title not in seen_titles:
-            unique_articles.append(art)
-            seen_titles.add(normalized_title)
+            future = _feed_pool.submit(fetch_feed, source_name, url)
+            _in_flight[source_name] = future
+            futures[future] = source_name
+    if not futures:
+        return
+    done, pending = wait(futures, timeout=FETCH_DEADLINE)
+
+    for future in done:
+        try:
+            future.result()
+        except Exception as e:
+            # Se ocorrer um erro (incluindo timeout), regista e continua para o próximo feed
+            print(f"Erro ao ler feed {futures[future]}: {e}")
+    for future in pending:
+        # Continua em background até ao FEED_TIMEOUT; o resultado entra no armazém quando chegar
+        print(f"Feed {futures[future]} não respondeu a tempo, ignorado nesta atualização.")
+
+def get_simracing_news():
+    refresh_feeds()
+    news_store.prune()
+
+    # O armazém já não tem títulos repetidos; aplica a data de corte e o limite
+    # de 5 notícias por fonte, mais recentes primeiro.
+    # All = até 50 notícias para o botão "Carregar Mais"
+    unique_articles = news_store.recent_articles(get_cutoff_date(), per_source=MAX_ENTRIES_PER_FEED, limit=50)
 
     # Destaques = primeiras 6 (as mais recentes de todas)
     highlights = unique_articles[:6]
-    
-    # All = até 50 notícias para o botão "Carregar Mais"
+
     return {
         "highlights": highlights,
-        "all": unique_articles[:50]
+        "all": unique_articles
     }
+
+def get_feeds_health():
+    return news_health.health_report([source_name for source_name, _ in FEEDS])
@@ -0,0 +1,156 @@
+"""
+Deteção de notícias quase duplicadas (a mesma história em vários sites).
+
+   - URL canónico: sem parâmetros de tracking (utm_*, fbclid, ...), sem "www.",
+     sem fragmento nem barra final. O mesmo artigo com links diferentes conta
+     como repetido.
+   - Títulos parecidos: MinHash sobre n-gramas de caracteres do título
+     normalizado + LSH (bandas), para comparar cada título novo só com os
+     candidatos do mesmo balde em vez de com todos os artigos guardados.
+
+O índice é incremental: cada artigo novo é acrescentado, e `sync` lê do
+armazém só as linhas que outros workers inseriram entretanto. Quando algum
+worker apaga artigos antigos, a geração guardada no armazém muda e `sync`
+reconstrói o índice do zero (o SQLite pode reutilizar os rowids apagados).
+"""
+
+import html
+import re
+import threading
+import unicodedata
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 16                    # 16 bandas x 4 linhas: candidatos a partir de ~50% de semelhança
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.6    # Jaccard dos n-gramas para contar como duplicado
+SHINGLE_SIZE = 4
+
+TRACKING_PARAMS = re.compile(r'^(utm_.*|fbclid|gclid|mc_cid|mc_eid|ref|source|cmpid|igshid)$', re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^a-z0-9 ]+')
+_SPACES_RE = re.compile(r'\s+')
+_NUMBER_RE = re.compile(r'\d+')
+
+_MERSENNE = (1 << 61) - 1
+_rng = np.random.default_rng(397)
+# a, b < 2^32 e hashes crc32 < 2^32: a * x + b cabe em uint64 sem overflow
+_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+
+def canonical_url(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, query, ""))
+
+
+def normalize_title(title):
+    text = unicodedata.normalize("NFKD", html.unescape(title).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _SPACES_RE.sub(" ", _NON_WORD_RE.sub(" ", text)).strip()
+
+
+def shingles(title):
+    text = normalize_title(title)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    """Assinatura MinHash (NUM_PERM inteiros) de um conjunto de n-gramas."""
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    # Uma permutação por linha: (a * x + b) mod p, com p primo de Mersenne
+    permuted = (np.outer(_A, hashes) + _B[:, None]) % np.uint64(_MERSENNE)
+    return permuted.min(axis=1)
+
+
+def numbers(title):
+    """Números do título: "Round 3" e "Round 4" nunca são a mesma notícia."""
+    return frozenset(_NUMBER_RE.findall(normalize_title(title)))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class NearDuplicateIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._clear()
+
+    def _clear(self):
+        self._buckets = {}       # (banda, assinatura da banda) -> {id}
+        self._shingles = {}      # id -> n-gramas do título
+        self._numbers = {}       # id -> números do título
+        self._urls = {}          # url canónico -> id
+        self.last_rowid = 0
+
+    def reset(self):
+        """Esvazia o índice (ex: depois de apagar artigos antigos); o próximo sync reconstrói-o."""
+        with self._lock:
+            self._clear()
+
+    def _bands(self, signature):
+        return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def find_duplicate(self, url, title):
+        """Id de um artigo já indexado que é o mesmo (URL) ou quase o mesmo (título), ou None."""
+        shingle_set = shingles(title)
+        title_numbers = numbers(title)
+        with self._lock:
+            existing = self._urls.get(canonical_url(url))
+            if existing is not None:
+                return existing
+            if not shingle_set:
+                return None
+            candidates = set()
+            for band_key in self._bands(minhash(shingle_set)):
+                candidates |= self._buckets.get(band_key, set())
+            for candidate in candidates:
+                if self._numbers[candidate] != title_numbers:
+                    continue
+                if jaccard(shingle_set, self._shingles[candidate]) >= SIMILARITY_THRESHOLD:
+                    return candidate
+        return None
+
+    def add(self, article_id, url, title):
+        shingle_set = shingles(title)
+        with self._lock:
+            self._urls[canonical_url(url)] = article_id
+            self.last_rowid = max(self.last_rowid, article_id)
+            if not shingle_set:
+                return
+            self._shingles[article_id] = shingle_set
+            self._numbers[article_id] = numbers(title)
+            for band_key in self._bands(minhash(shingle_set)):
+                self._buckets.setdefault(band_key, set()).add(article_id)
+
+    def sync(self, con, generation=0):
+        """
+        Indexa as linhas do armazém (tabela articles) inseridas depois da última
+        vista. Se a geração mudou (houve artigos apagados), recomeça do zero.
+        """
+        if generation != self.generation:
+            self.reset()
+            self.generation = generation
+        rows = con.execute(
+            "SELECT rowid, url, title FROM articles WHERE rowid > ? ORDER BY rowid", (self.last_rowid,)
+        ).fetchall()
+        for rowid, url, title in rows:
+            self.add(rowid, url, title)
+
+    def __len__(self):
+        return len(self._urls)
+
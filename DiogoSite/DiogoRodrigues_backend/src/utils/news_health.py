@@ -0,0 +1,120 @@
+"""
+Saúde de cada fonte de notícias e quando voltar a pedi-la.
+
+   - Circuit breaker: depois de FAILURE_THRESHOLD erros seguidos a fonte fica
+     "aberta" (não é pedida) durante um backoff exponencial, até MAX_BACKOFF.
+     Passado esse tempo há uma tentativa; se falhar, o backoff duplica.
+   - Polling adaptativo: o intervalo entre pedidos segue o ritmo a que a fonte
+     publica (intervalo mediano entre artigos / 4), entre MIN_POLL e MAX_POLL.
+   - Latências das últimas LATENCY_HISTORY chamadas, erros e último erro,
+     guardados no armazém das notícias (partilhado pelos workers).
+"""
+
+import json
+import time
+
+from src.utils import news_store
+
+FAILURE_THRESHOLD = 2
+BASE_BACKOFF = 5 * 60        # 5 min
+MAX_BACKOFF = 6 * 60 * 60    # 6 h
+MIN_POLL = 5 * 60            # fontes muito ativas: de 5 em 5 min
+MAX_POLL = 2 * 60 * 60       # fontes paradas: de 2 em 2 h
+DEFAULT_POLL = 15 * 60       # sem histórico suficiente
+LATENCY_HISTORY = 20
+
+_COLUMNS = (
+    "source", "fetches", "errors", "consecutive_failures", "latencies",
+    "last_error", "last_success", "open_until", "poll_interval", "next_poll",
+)
+
+
+def _load(con, source):
+    row = con.execute(f"SELECT {', '.join(_COLUMNS)} FROM feed_health WHERE source = ?", (source,)).fetchone()
+    if row is None:
+        return {
+            "source": source, "fetches": 0, "errors": 0, "consecutive_failures": 0, "latencies": [],
+            "last_error": None, "last_success": None, "open_until": 0, "poll_interval": None, "next_poll": 0,
+        }
+    state = dict(zip(_COLUMNS, row))
+    state["latencies"] = json.loads(state["latencies"])
+    return state
+
+
+def _save(con, state):
+    values = {**state, "latencies": json.dumps(state["latencies"][-LATENCY_HISTORY:])}
+    con.execute(
+        f"INSERT OR REPLACE INTO feed_health ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+        tuple(values[col] for col in _COLUMNS),
+    )
+
+
+def poll_interval_for(source):
+    interval = news_store.publish_interval(source)
+    if interval is None:
+        return DEFAULT_POLL
+    return min(max(interval / 4, MIN_POLL), MAX_POLL)
+
+
+def should_fetch(source, now=None):
+    """A fonte pode ser pedida agora? (não está aberta nem antes do próximo pedido)"""
+    now = now or time.time()
+    with news_store.connect() as con:
+        state = _load(con, source)
+    return now >= state["open_until"] and now >= state["next_poll"]
+
+
+def record_success(source, latency_ms):
+    now = time.time()
+    interval = poll_interval_for(source)
+    with news_store.connect() as con:
+        state = _load(con, source)
+        state["fetches"] += 1
+        state["consecutive_failures"] = 0
+        state["open_until"] = 0
+        state["last_success"] = now
+        state["latencies"].append(round(latency_ms, 1))
+        state["poll_interval"] = interval
+        state["next_poll"] = now + interval
+        _save(con, state)
+
+
+def record_failure(source, latency_ms, error):
+    now = time.time()
+    with news_store.connect() as con:
+        state = _load(con, source)
+        state["fetches"] += 1
+        state["errors"] += 1
+        state["consecutive_failures"] += 1
+        state["latencies"].append(round(latency_ms, 1))
+        state["last_error"] = str(error)[:300]
+        failures = state["consecutive_failures"]
+        if failures >= FAILURE_THRESHOLD:
+            backoff = min(BASE_BACKOFF * 2 ** (failures - FAILURE_THRESHOLD), MAX_BACKOFF)
+            state["open_until"] = now + backoff
+        _save(con, state)
+
+
+def health_report(sources):
+    """Estado de cada fonte para o endpoint de saúde."""
+    now = time.time()
+    with news_store.connect() as con:
+        states = [_load(con, source) for source in sources]
+
+    report = []
+    for state in states:
+        latencies = sorted(state["latencies"])
+        report.append({
+            "source": state["source"],
+            "state": "open" if state["open_until"] > now else "closed",
+            "fetches": state["fetches"],
+            "errors": state["errors"],
+            "consecutiveFailures": state["consecutive_failures"],
+            "lastError": state["last_error"],
+            "lastSuccess": state["last_success"],
+            "avgLatencyMs": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p95LatencyMs": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+            "pollIntervalSeconds": state["poll_interval"],
+            "nextAttemptIn": max(0, round(max(state["open_until"], state["next_poll"]) - now)),
+        })
+    return report
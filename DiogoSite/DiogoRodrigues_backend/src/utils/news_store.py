@@ -0,0 +1,212 @@
+"""
+Armazém persistente das notícias (SQLite), para atualizar só o que mudou.
+
+   - feeds:    por fonte, o ETag / Last-Modified da última resposta, usados no
+               GET condicional seguinte (um feed sem alterações responde 304).
+   - feed_health: latências, erros e próximo pedido de cada fonte (news_health.py).
+   - articles: os artigos já processados, indexados por data. Os feeds novos
+               acrescentam artigos; a data de corte e os duplicados são
+               aplicados na consulta e na inserção, não na lista toda.
+   - store_meta: a geração dos apagamentos (prune), vista por todos os workers.
+
+Partilhado por todos os workers (WAL) e sobrevive a reinícios.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.utils.news_dedup import NearDuplicateIndex
+
+NEWS_STORE_PATH = os.getenv(
+    "NEWS_STORE_PATH", os.path.join(os.getcwd(), "cache_data", "news.sqlite3")
+)
+NEWS_RETENTION_DAYS = int(os.getenv("NEWS_RETENTION_DAYS", 30))
+
+_init_lock = threading.Lock()
+_initialized = set()
+
+# Índice de quase-duplicados dos artigos guardados (URL canónico + títulos parecidos)
+dedup_index = NearDuplicateIndex()
+_add_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    source TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    modified TEXT,
+    last_fetch REAL,
+    last_change REAL
+);
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    title_key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    description TEXT,
+    image TEXT,
+    source TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_timestamp ON articles (timestamp DESC);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feed_health (
+    source TEXT PRIMARY KEY,
+    fetches INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    latencies TEXT NOT NULL DEFAULT '[]',
+    last_error TEXT,
+    last_success REAL,
+    open_until REAL NOT NULL DEFAULT 0,
+    poll_interval REAL,
+    next_poll REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+@contextmanager
+def connect(path=None):
+    path = path or NEWS_STORE_PATH
+    with _init_lock:
+        if path not in _initialized:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            con = sqlite3.connect(path, timeout=5)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            con.close()
+            _initialized.add(path)
+    con = sqlite3.connect(path, timeout=5)
+    try:
+        yield con
+        con.commit()
+    finally:
+        con.close()
+
+
+def title_key(title):
+    """Título normalizado usado para não repetir a mesma notícia."""
+    return " ".join(title.lower().split())
+
+
+def feed_validators(source):
+    """(etag, modified) guardados para a fonte, ou (None, None)."""
+    with connect() as con:
+        row = con.execute("SELECT etag, modified FROM feeds WHERE source = ?", (source,)).fetchone()
+    return row if row else (None, None)
+
+
+def save_feed_state(source, url, etag, modified, changed):
+    now = time.time()
+    with connect() as con:
+        con.execute(
+            """
+            INSERT INTO feeds (source, url, etag, modified, last_fetch, last_change)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET
+                url = excluded.url,
+                etag = coalesce(excluded.etag, feeds.etag),
+                modified = coalesce(excluded.modified, feeds.modified),
+                last_fetch = excluded.last_fetch,
+                last_change = CASE WHEN ? THEN excluded.last_change ELSE feeds.last_change END
+            """,
+            (source, url, etag, modified, now, now if changed else None, int(changed)),
+        )
+
+
+def add_articles(articles):
+    """
+    Acrescenta artigos novos. Um URL já conhecido só atualiza o texto e a
+    imagem (mantém a data); a mesma notícia noutra fonte (URL canónico igual
+    ou título quase igual) é ignorada. Devolve o número de artigos novos.
+    """
+    now = time.time()
+    added = 0
+    with _add_lock, connect() as con:
+        dedup_index.sync(con, prune_generation(con))
+        for art in articles:
+            key = title_key(art["title"])
+            updated = con.execute(
+                "UPDATE articles SET title = ?, description = ?, image = ? WHERE url = ?",
+                (art["title"], art["description"], art["image"], art["url"]),
+            ).rowcount
+            if updated or dedup_index.find_duplicate(art["url"], art["title"]) is not None:
+                continue
+            cursor = con.execute(
+                """
+                INSERT OR IGNORE INTO articles (url, title_key, title, description, image, source, timestamp, first_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (art["url"], key, art["title"], art["description"], art["image"], art["source"], art["timestamp"], now),
+            )
+            if cursor.rowcount:
+                dedup_index.add(cursor.lastrowid, art["url"], art["title"])
+                added += 1
+    return added
+
+
+def recent_articles(cutoff_date, per_source=5, limit=50):
+    """Artigos desde `cutoff_date` (inclusive), mais recentes primeiro, no máximo `per_source` por fonte."""
+    cutoff_ts = time.mktime(datetime.combine(cutoff_date, datetime.min.time()).timetuple())
+    with connect() as con:
+        rows = con.execute(
+            """
+            SELECT title, url, description, image, source, timestamp FROM (
+                SELECT *, row_number() OVER (PARTITION BY source ORDER BY timestamp DESC) AS rank
+                FROM articles
+                WHERE timestamp >= ?
+            )
+            WHERE rank <= ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+            """,
+            (cutoff_ts, per_source, limit),
+        ).fetchall()
+    keys = ("title", "url", "description", "image", "source", "timestamp")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def publish_interval(source, sample=10):
+    """Intervalo mediano (s) entre os últimos artigos da fonte, ou None se houver poucos."""
+    with connect() as con:
+        rows = con.execute(
+            "SELECT timestamp FROM articles WHERE source = ? ORDER BY timestamp DESC LIMIT ?",
+            (source, sample),
+        ).fetchall()
+    gaps = sorted(a[0] - b[0] for a, b in zip(rows, rows[1:]) if a[0] > b[0])
+    if len(gaps) < 2:
+        return None
+    return gaps[len(gaps) // 2]
+
+
+def prune_generation(con):
+    """Quantas vezes já foram apagados artigos: muda a cada prune que apaga alguma coisa."""
+    row = con.execute("SELECT value FROM store_meta WHERE key = 'prune_generation'").fetchone()
+    return row[0] if row else 0
+
+
+def prune(retention_days=NEWS_RETENTION_DAYS):
+    """
+    Apaga artigos mais antigos do que a retenção. Na mesma transação sobe a
+    geração, para o índice de duplicados de todos os workers se reconstruir.
+    """
+    with connect() as con:
+        deleted = con.execute(
+            "DELETE FROM articles WHERE timestamp < ?", (time.time() - retention_days * 86400,)
+        ).rowcount
+        if deleted:
+            con.execute(
+                """
+                INSERT INTO store_meta (key, value) VALUES ('prune_generation', 1)
+                ON CONFLICT(key) DO UPDATE SET value = value + 1
+                """
+            )
@@ -0,0 +1,52 @@
+"""
+Cache of serialized /telemetry/query responses.
+
+Session files are read-only, so the same SQL on the same file always gives
+the same answer. Entries are keyed by (file path, normalized SQL) and hold
+the response body bytes, bounded by total size. The cache is a
+SessionLRUCache, so release_session drops a file's entries when
+cleanup_old_files deletes it.
+"""
+
+import os
+import re
+
+from src.utils.lru_cache import SessionLRUCache
+
+QUERY_CACHE_MAX_MB = int(os.getenv("TELEMETRY_QUERY_CACHE_MB", 64))
+
+# Results that change between runs even on the same file are never cached
+_VOLATILE_RE = re.compile(
+    r'\b(random|gen_random_uuid|uuid|now|current_timestamp|current_date|current_time|get_current_time|setseed)\b'
+)
+# Quoted strings/identifiers are kept as-is; everything else is normalized
+_TOKEN_RE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|([^'"]+)|(['"])""")
+
+query_result_cache = SessionLRUCache(
+    "query_results",
+    max_entries=512,
+    max_bytes=QUERY_CACHE_MAX_MB * 1024 * 1024,
+    sizeof=lambda entry: len(entry[0]),
+)
+
+
+def normalize_sql(query):
+    """
+    Collapses whitespace and lowercases everything outside quotes, and drops
+    a trailing semicolon, so trivially different spellings share an entry.
+    """
+    parts = []
+    for quoted, plain, stray in _TOKEN_RE.findall(query):
+        if quoted or stray:
+            parts.append(quoted or stray)
+        else:
+            parts.append(re.sub(r'\s+', ' ', plain).lower())
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def cache_key(filepath, query):
+    """Key for `query` on `filepath`, or None when the query should not be cached."""
+    normalized = normalize_sql(query)
+    if _VOLATILE_RE.search(normalized):
+        return None
+    return query_result_cache.session_key(filepath, normalized)
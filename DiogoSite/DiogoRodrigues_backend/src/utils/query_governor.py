@@ -0,0 +1,163 @@
+"""
+Admission control and limits for ad-hoc SQL on /telemetry/query.
+
+- A global semaphore bounds how many queries run at once; extra requests
+  wait in line for up to QUERY_QUEUE_TIMEOUT_S and then get a 503.
+- Every query has a wall-clock limit enforced with DuckDB's interrupt(),
+  so the engine really stops working instead of the request merely giving up.
+- JSON results are capped at QUERY_MAX_ROWS rows, fetched under the slot
+  and time limit; the caller reports the truncation in response headers.
+- Streamed formats read the result batch by batch while holding the slot,
+  under their own, larger limits (QUERY_STREAM_MAX_ROWS rows within
+  QUERY_STREAM_TIMEOUT_S), so exports of whole telemetry tables still fit
+  and the cap is enforced as rows are sent, never by buffering them.
+
+Memory and thread limits are set per attached database in duckdb_pool.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+
+QUERY_TIMEOUT_S = float(os.getenv("TELEMETRY_QUERY_TIMEOUT_S", 30))
+QUERY_MAX_ROWS = int(os.getenv("TELEMETRY_QUERY_MAX_ROWS", 100_000))
+QUERY_MAX_CONCURRENT = int(os.getenv("TELEMETRY_QUERY_MAX_CONCURRENT", 2))
+QUERY_QUEUE_TIMEOUT_S = float(os.getenv("TELEMETRY_QUERY_QUEUE_TIMEOUT_S", 10))
+QUERY_STREAM_MAX_ROWS = int(os.getenv("TELEMETRY_QUERY_STREAM_MAX_ROWS", 10_000_000))
+QUERY_STREAM_TIMEOUT_S = float(os.getenv("TELEMETRY_QUERY_STREAM_TIMEOUT_S", 300))
+
+# DuckDB vectors (2048 rows) per DataFrame chunk / Arrow record batch
+_FETCH_VECTORS = 5
+
+
+class QueryLimitError(Exception):
+    """A query was rejected or stopped by a limit; `status` is the HTTP code to answer with."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class CappedResult:
+    """
+    Iterates a DuckDB result as DataFrame chunks or (`arrow`) Arrow record
+    batches and stops after `max_rows` rows. `schema` is the cursor
+    description, or the Arrow schema when `arrow`; `truncated` tells, once the
+    iteration is over, whether rows were left out.
+    """
+
+    def __init__(self, result, max_rows, arrow=False):
+        self.max_rows = max_rows
+        self.arrow = arrow
+        self.truncated = False
+        if arrow:
+            reader = result.fetch_record_batch(_FETCH_VECTORS * 2048)
+            self.schema = reader.schema
+            self._next_chunk = lambda: next(reader, None)
+        else:
+            self.schema = result.description
+            self._next_chunk = lambda: result.fetch_df_chunk(_FETCH_VECTORS)
+
+    def __iter__(self):
+        rows = 0
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None or len(chunk) == 0:
+                if rows == 0 and chunk is not None:
+                    # Empty result: the empty chunk still carries the columns
+                    yield chunk
+                return
+            if rows + len(chunk) > self.max_rows:
+                self.truncated = True
+                keep = self.max_rows - rows
+                if keep > 0:
+                    yield chunk.slice(0, keep) if self.arrow else chunk.iloc[:keep]
+                return
+            rows += len(chunk)
+            yield chunk
+
+
+class QueryGovernor:
+    def __init__(self, max_concurrent=QUERY_MAX_CONCURRENT, queue_timeout=QUERY_QUEUE_TIMEOUT_S,
+                 timeout=QUERY_TIMEOUT_S, max_rows=QUERY_MAX_ROWS,
+                 stream_max_rows=QUERY_STREAM_MAX_ROWS, stream_timeout=QUERY_STREAM_TIMEOUT_S):
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.stream_max_rows = stream_max_rows
+        self.stream_timeout = stream_timeout
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @contextmanager
+    def slot(self):
+        """Holds one of the concurrent query slots, queueing for up to `queue_timeout` seconds."""
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.running += 1
+        if not acquired:
+            raise QueryLimitError("Server is busy with other queries, please retry shortly", 503)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._slots.release()
+
+    def _interrupt(self, con):
+        with self._lock:
+            self.timed_out += 1
+        con.interrupt()
+
+    @contextmanager
+    def time_limit(self, con, timeout=None):
+        """Interrupts whatever `con` is running once `timeout` (default: `self.timeout`) seconds have passed."""
+        timeout = self.timeout if timeout is None else timeout
+        timer = threading.Timer(timeout, self._interrupt, args=(con,))
+        timer.daemon = True
+        timer.start()
+        try:
+            yield
+        except duckdb.InterruptException:
+            raise QueryLimitError(f"Query exceeded the {timeout:g} s time limit", 504)
+        finally:
+            timer.cancel()
+
+    def fetch_capped_df(self, con, query):
+        """Runs `query` under the time limit; returns (DataFrame of at most max_rows rows, truncated)."""
+        with self.time_limit(con):
+            result = CappedResult(con.execute(query), self.max_rows)
+            chunks = list(result)
+        df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+        return df, result.truncated
+
+    def stats(self):
+        with self._lock:
+            return {
+                "maxConcurrent": self.max_concurrent,
+                "running": self.running,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+                "timedOut": self.timed_out,
+                "timeoutSeconds": self.timeout,
+                "maxRows": self.max_rows,
+                "streamTimeoutSeconds": self.stream_timeout,
+                "streamMaxRows": self.stream_max_rows,
+            }
+
+
+query_governor = QueryGovernor()
@@ -0,0 +1,197 @@
+"""
+Opt-in persistent history of lap summaries across uploaded sessions.
+
+When TELEMETRY_HISTORY_DIR is set, every analyzed session appends its laps to
+a Parquet dataset partitioned by track and car:
+
+    <dir>/track_key=<track>/car_key=<car>/<session>.parquet
+
+Queries read the dataset with hive partitioning, so filtering by track or car
+only opens the matching directories and never the raw session files, which
+are still deleted after the retention window.
+"""
+
+import glob
+import logging
+import os
+import re
+import threading
+
+import duckdb
+
+from src.utils.telemetry_laps import list_channel_tables
+
+HISTORY_DIR = os.getenv("TELEMETRY_HISTORY_DIR")
+UNKNOWN = "unknown"
+MAX_HISTORY_RESULTS = 500
+
+# Keys looked up in the session's metadata table when the upload does not say
+METADATA_KEYS = {
+    "track": ("TrackName", "Track", "track"),
+    "car": ("CarName", "Car", "VehicleName", "car"),
+    "sessionType": ("SessionType", "Session", "session"),
+}
+
+_write_lock = threading.Lock()
+# Set once a Parquet file is known to exist; history files are never deleted by the app
+_has_files = False
+
+
+def history_enabled():
+    return bool(HISTORY_DIR)
+
+
+def partition_key(value):
+    """Directory-safe, case-insensitive partition value."""
+    key = re.sub(r'[^a-z0-9]+', '_', (value or UNKNOWN).lower()).strip('_')
+    return key or UNKNOWN
+
+
+def session_metadata(con, provided=None):
+    """
+    Track, car and session type: from the upload form first, then from
+    lmu.metadata. Without either, the session is stored under "unknown".
+    """
+    provided = provided or {}
+    stored = {}
+    if "metadata" in list_channel_tables(con):
+        try:
+            stored = dict(con.execute('SELECT key::VARCHAR, value::VARCHAR FROM lmu.metadata').fetchall())
+        except duckdb.Error:
+            stored = {}
+
+    meta = {}
+    for field, keys in METADATA_KEYS.items():
+        value = provided.get(field) or next((stored[key] for key in keys if stored.get(key)), None)
+        meta[field] = str(value).strip() if value else UNKNOWN
+    return meta
+
+
+def append_session(session_id, laps, metadata):
+    """Writes (or rewrites) the lap summary file of one session. Idempotent per session."""
+    if not history_enabled() or not laps:
+        return None
+
+    folder = os.path.join(
+        HISTORY_DIR,
+        f"track_key={partition_key(metadata['track'])}",
+        f"car_key={partition_key(metadata['car'])}",
+    )
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, f"{session_id}.parquet")
+    tmp_target = target + ".tmp"
+
+    rows = [
+        (session_id, metadata["track"], metadata["car"], metadata["sessionType"],
+         lap["lapNumber"], float(lap["timeSeconds"]), bool(lap["valid"]))
+        for lap in laps
+    ]
+    with _write_lock:
+        writer = duckdb.connect()
+        try:
+            writer.execute(
+                "CREATE TABLE laps (session VARCHAR, track VARCHAR, car VARCHAR, session_type VARCHAR, "
+                "lap INTEGER, time_seconds DOUBLE, valid BOOLEAN)"
+            )
+            writer.executemany("INSERT INTO laps VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            quoted_target = tmp_target.replace("'", "''")
+            writer.execute(
+                f"COPY (SELECT *, now()::TIMESTAMP AS recorded_at FROM laps) TO '{quoted_target}' (FORMAT PARQUET)"
+            )
+        finally:
+            writer.close()
+        os.replace(tmp_target, target)
+    global _has_files
+    _has_files = True
+    return target
+
+
+def record_session(con, filepath, laps, provided_metadata=None):
+    """Best-effort append used by the analysis: history problems never fail an upload."""
+    if not history_enabled():
+        return
+    try:
+        session_id = os.path.basename(filepath).rsplit('.', 1)[0]
+        append_session(session_id, laps, session_metadata(con, provided_metadata))
+    except Exception as e:
+        logging.warning(f"Could not append session to telemetry history: {e}")
+
+
+def _dataset():
+    pattern = os.path.join(HISTORY_DIR, "**", "*.parquet").replace("'", "''")
+    return f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+
+
+def _has_data():
+    """True when the dataset has at least one file; stops at the first partition file found."""
+    global _has_files
+    if not _has_files:
+        pattern = os.path.join(glob.escape(HISTORY_DIR), "track_key=*", "car_key=*", "*.parquet")
+        _has_files = next(glob.iglob(pattern), None) is not None
+    return _has_files
+
+
+def _filters(track=None, car=None, days=None, session_type=None):
+    clauses, params = [], []
+    if track:
+        clauses.append("track_key = ?")
+        params.append(partition_key(track))
+    if car:
+        clauses.append("car_key = ?")
+        params.append(partition_key(car))
+    if session_type:
+        clauses.append("lower(session_type) = lower(?)")
+        params.append(session_type)
+    if days:
+        clauses.append("recorded_at >= now()::TIMESTAMP - to_days(?)")
+        params.append(int(days))
+    return (" AND ".join(clauses) or "TRUE"), params
+
+
+def best_laps(track=None, car=None, days=None, session_type=None, limit=10):
+    """Fastest valid laps across stored sessions, e.g. best laps at Spa over the last 30 days."""
+    if not history_enabled() or not _has_data():
+        return []
+    where, params = _filters(track, car, days, session_type)
+    limit = max(1, min(int(limit), MAX_HISTORY_RESULTS))
+    con = duckdb.connect()
+    try:
+        rows = con.execute(
+            f"""
+            SELECT session, track, car, session_type, lap, time_seconds, recorded_at::VARCHAR
+            FROM {_dataset()}
+            WHERE valid AND {where}
+            ORDER BY time_seconds
+            LIMIT {limit}
+            """,
+            params,
+        ).fetchall()
+    finally:
+        con.close()
+    keys = ("session", "track", "car", "sessionType", "lapNumber", "timeSeconds", "recordedAt")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def history_overview(track=None, car=None, days=None):
+    """Per track/car: sessions, laps, best and average valid lap, last session date."""
+    if not history_enabled() or not _has_data():
+        return []
+    where, params = _filters(track, car, days)
+    con = duckdb.connect()
+    try:
+        rows = con.execute(
+            f"""
+            SELECT any_value(track), any_value(car), count(DISTINCT session), count(*),
+                   min(time_seconds) FILTER (WHERE valid), avg(time_seconds) FILTER (WHERE valid),
+                   max(recorded_at)::VARCHAR
+            FROM {_dataset()}
+            WHERE {where}
+            GROUP BY track_key, car_key
+            ORDER BY 1, 2
+            """,
+            params,
+        ).fetchall()
+    finally:
+        con.close()
+    keys = ("track", "car", "sessions", "laps", "bestTimeSeconds", "avgTimeSeconds", "lastRecordedAt")
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,122 @@
+"""
+Session summary sidecar, built once when a telemetry file is uploaded.
+
+The summary holds the table catalog, row counts, schemas, 20-row previews and
+the lap list, and is stored as `<session>.summary.json` next to the upload.
+The catalog queries sent by the Telemetry page (`SHOW ALL TABLES`, table
+preview, `DESCRIBE`) are answered from it without touching DuckDB.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from src.utils.json_serialize import dataframe_to_records
+from src.utils.telemetry_laps import quote_ident
+
+SUMMARY_SUFFIX = '.summary.json'
+PREVIEW_ROWS = 20
+# Parsed summaries kept in memory, so a cached answer does not even re-read the sidecar
+MAX_LOADED_SUMMARIES = 16
+
+_SHOW_TABLES_RE = re.compile(r'^SHOW ALL TABLES$', re.IGNORECASE)
+_PREVIEW_RE = re.compile(rf'^SELECT \* FROM lmu\."((?:[^"]|"")+)" LIMIT {PREVIEW_ROWS}$', re.IGNORECASE)
+_DESCRIBE_RE = re.compile(r'^DESCRIBE SELECT \* FROM lmu\."((?:[^"]|"")+)"$', re.IGNORECASE)
+
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def summary_path(filepath):
+    return filepath + SUMMARY_SUFFIX
+
+
+def build_summary(con, laps):
+    """Collects everything the catalog buttons need from an attached session."""
+    tables = {}
+    for (name,) in con.execute(
+        "SELECT table_name FROM information_schema.tables WHERE table_catalog = 'lmu' ORDER BY table_name"
+    ).fetchall():
+        relation = f'lmu.{quote_ident(name)}'
+        tables[name] = {
+            "rowCount": con.execute(f'SELECT count(*) FROM {relation}').fetchone()[0],
+            "schema": dataframe_to_records(con.execute(f'DESCRIBE SELECT * FROM {relation}').df()),
+            "preview": dataframe_to_records(con.execute(f'SELECT * FROM {relation} LIMIT {PREVIEW_ROWS}').df()),
+        }
+
+    return {
+        "showAllTables": dataframe_to_records(con.execute('SHOW ALL TABLES').df()),
+        "tables": tables,
+        "laps": laps,
+    }
+
+
+def write_summary(filepath, summary):
+    path = summary_path(filepath)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, default=str)
+    os.replace(tmp_path, path)
+    with _loaded_lock:
+        _loaded.pop(path, None)
+
+
+def load_summary(filepath):
+    """Returns the summary of a session, or None if it has not been built (or has expired)."""
+    path = summary_path(filepath)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == mtime:
+            _loaded.move_to_end(path)
+            return cached[1]
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    with _loaded_lock:
+        _loaded[path] = (mtime, summary)
+        _loaded.move_to_end(path)
+        while len(_loaded) > MAX_LOADED_SUMMARIES:
+            _loaded.popitem(last=False)
+    return summary
+
+
+def discard_summary(filepath):
+    """Removes the sidecar of a session (called when the session file is deleted)."""
+    path = summary_path(filepath)
+    with _loaded_lock:
+        _loaded.pop(path, None)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _normalize(query):
+    return ' '.join(query.split()).rstrip(';').strip()
+
+
+def cached_query_result(summary, query):
+    """Answers the Telemetry page catalog queries from the summary, or None if not covered."""
+    if not summary:
+        return None
+    query = _normalize(query)
+
+    if _SHOW_TABLES_RE.match(query):
+        return summary["showAllTables"]
+
+    for pattern, key in ((_PREVIEW_RE, "preview"), (_DESCRIBE_RE, "schema")):
+        match = pattern.match(query)
+        if match:
+            table = summary["tables"].get(match.group(1).replace('""', '"'))
+            return table[key] if table else None
+
+    return None
@@ -0,0 +1,122 @@
+"""
+Single-flight: no máximo um pedido à API por chave de cache de cada vez.
+
+- Dentro do processo: a primeira thread vai buscar os dados e as outras
+  esperam pelo mesmo resultado.
+- Entre workers do gunicorn: um lock de ficheiro (fcntl) por chave. Quem
+  tem o lock escreve o resultado num ficheiro partilhado; os outros workers,
+  quando conseguem o lock, usam esse resultado se for recente em vez de
+  voltarem a gastar quota.
+Em sistemas sem fcntl (Windows) fica só a coordenação dentro do processo.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SINGLE_FLIGHT_DIR = os.getenv(
+    "SINGLE_FLIGHT_DIR", os.path.join(tempfile.gettempdir(), "diogosite_single_flight")
+)
+# Um resultado escrito por outro worker há menos do que isto é reutilizado
+SHARED_RESULT_TTL = 10
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, folder=SINGLE_FLIGHT_DIR, shared_ttl=SHARED_RESULT_TTL):
+        self.folder = folder
+        self.shared_ttl = shared_ttl
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fetch):
+        """Devolve fetch(), partilhando a chamada com quem pedir a mesma chave ao mesmo tempo."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._fetch_across_workers(key, fetch)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _paths(self, key):
+        safe = re.sub(r'[^A-Za-z0-9_.-]+', '_', key)
+        base = os.path.join(self.folder, safe)
+        return base + ".lock", base + ".json"
+
+    def _fetch_across_workers(self, key, fetch):
+        if fcntl is None:
+            return fetch()
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            lock_path, result_path = self._paths(key)
+            lock_file = open(lock_path, "a")
+        except OSError as e:
+            logging.warning(f"Single-flight sem lock de ficheiro para '{key}': {e}")
+            return fetch()
+
+        with lock_file:
+            # Bloqueia enquanto outro worker está a ir buscar a mesma chave
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                shared = self._read_shared(result_path)
+                if shared is not None:
+                    return shared
+                result = fetch()
+                self._write_shared(result_path, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_shared(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > self.shared_ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_shared(self, path, result):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Não foi possível partilhar o resultado de '{path}': {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+single_flight = SingleFlight()
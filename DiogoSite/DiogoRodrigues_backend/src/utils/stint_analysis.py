@@ -0,0 +1,209 @@
+"""
+Stint analytics over the lap list of one session.
+
+- Pit laps come from the `In Pits` channel: a lap that starts in the pits is
+  an out-lap, a lap that enters them is an in-lap. Sessions without that
+  channel fall back to lap time: runs of laps slower than PIT_LAP_FACTOR x
+  the median valid lap are taken as pit stops (first = in, last = out).
+- A new stint starts with each out-lap (or the lap after an in-lap).
+- Within a stint, the racing laps (valid, not in/out) are checked for
+  outliers with a robust z-score (MAD) of their residual to a Theil-Sen
+  trend; a least-squares fit without them gives the degradation in s/lap.
+- Rolling consistency is the standard deviation of the clean laps over a
+  sliding window.
+
+The lap list comes from the upload-time session summary when there is one.
+Results are memoized per (file, window, outlier threshold).
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.utils.lru_cache import SessionLRUCache
+from src.utils.session_summary import load_summary
+from src.utils.telemetry_laps import LAP_INDEX_SQL, compute_laps, list_channel_tables
+
+DEFAULT_WINDOW = 5
+DEFAULT_OUTLIER_Z = 3.5
+PIT_LAP_FACTOR = 1.25
+MIN_FIT_LAPS = 3
+# Scales the MAD to the standard deviation of a normal distribution
+_MAD_SCALE = 0.6745
+
+stint_cache = SessionLRUCache("stint_analysis", max_entries=32)
+
+
+def _session_laps(con, filepath):
+    """Lap list from the session summary, computed from the file only when there is none."""
+    summary = load_summary(filepath)
+    return summary["laps"] if summary is not None else compute_laps(con)
+
+
+def _pit_flags_from_channel(con, lap_numbers):
+    """(in-lap, out-lap) masks from `In Pits`, aligned with `lap_numbers`."""
+    rows = con.execute(
+        f"""
+        WITH laps AS ({LAP_INDEX_SQL})
+        SELECT l.lap, bool_or(p.value > 0.5), arg_min(p.value, p.ts) > 0.5
+        FROM lmu."In Pits" p
+        ASOF JOIN laps l ON p.ts >= l.lap_start
+        GROUP BY l.lap
+        """
+    ).fetchall()
+    by_lap = {lap: (in_pits, starts_in_pits) for lap, in_pits, starts_in_pits in rows}
+    flags = np.array([by_lap.get(lap, (False, False)) for lap in lap_numbers.tolist()], dtype=bool).reshape(-1, 2)
+    pit_out = flags[:, 1]
+    pit_in = flags[:, 0] & ~pit_out
+    return pit_in, pit_out
+
+
+def _pit_flags_from_times(times, valid):
+    """(in-lap, out-lap) masks guessed from unusually slow laps."""
+    reference = np.median(times[valid]) if valid.any() else np.median(times)
+    slow = times > PIT_LAP_FACTOR * reference
+    previous_slow = np.concatenate([[False], slow[:-1]])
+    next_slow = np.concatenate([slow[1:], [False]])
+    pit_in = slow & ~previous_slow
+    # A single slow lap is only an in-lap; the out-lap ends a run of two or more
+    pit_out = slow & previous_slow & ~next_slow
+    return pit_in, pit_out
+
+
+def _stint_ids(pit_in, pit_out):
+    """0-based stint of every lap: a stint starts with an out-lap or right after an in-lap."""
+    starts = pit_out | np.concatenate([[False], pit_in[:-1]])
+    if len(starts):
+        starts[0] = False
+    return np.cumsum(starts)
+
+
+def _fit(x, y):
+    """Least-squares line through (x, y): (slope, intercept, r2)."""
+    slope, intercept = np.polyfit(x, y, 1)
+    residuals = y - (slope * x + intercept)
+    total = np.sum((y - y.mean()) ** 2)
+    r2 = 1 - np.sum(residuals ** 2) / total if total > 0 else 1.0
+    return float(slope), float(intercept), float(r2)
+
+
+def _robust_line(x, y):
+    """Theil-Sen line (median of pairwise slopes), which one slow lap cannot drag."""
+    i, j = np.triu_indices(len(x), k=1)
+    dx = x[j] - x[i]
+    slope = np.median((y[j] - y[i])[dx != 0] / dx[dx != 0])
+    return slope, np.median(y - slope * x)
+
+
+def _robust_z(residuals):
+    mad = np.median(np.abs(residuals - np.median(residuals)))
+    if mad == 0:
+        return np.zeros_like(residuals)
+    return _MAD_SCALE * (residuals - np.median(residuals)) / mad
+
+
+def _analyze_stint(lap_numbers, times, racing, window, threshold):
+    """Outliers, degradation and rolling consistency of one stint's laps."""
+    age = (lap_numbers - lap_numbers[0]).astype(float)
+    z = np.zeros_like(times)
+    outlier = np.zeros_like(racing)
+
+    x, y = age[racing], times[racing]
+    if len(y) >= MIN_FIT_LAPS:
+        slope, intercept = _robust_line(x, y)
+        z[racing] = _robust_z(y - (slope * x + intercept))
+        outlier[racing] = np.abs(z[racing]) > threshold
+
+    clean = racing & ~outlier
+    degradation = None
+    if clean.sum() >= MIN_FIT_LAPS:
+        slope, intercept, r2 = _fit(age[clean], times[clean])
+        degradation = {"secondsPerLap": slope, "intercept": intercept, "r2": r2, "laps": int(clean.sum())}
+
+    clean_times = times[clean]
+    rolling = []
+    if len(clean_times) >= window:
+        spread = sliding_window_view(clean_times, window).std(axis=1, ddof=1)
+        rolling = [
+            {"lapNumber": int(lap), "stdDevSeconds": float(std)}
+            for lap, std in zip(lap_numbers[clean][window - 1:], spread)
+        ]
+
+    summary = {
+        "laps": len(lap_numbers),
+        "cleanLaps": int(clean.sum()),
+        "bestSeconds": float(clean_times.min()) if len(clean_times) else None,
+        "meanSeconds": float(clean_times.mean()) if len(clean_times) else None,
+        "stdDevSeconds": float(clean_times.std(ddof=1)) if len(clean_times) > 1 else None,
+    }
+    return z, outlier, degradation, rolling, summary
+
+
+def stint_analysis(con, filepath, window=DEFAULT_WINDOW, threshold=DEFAULT_OUTLIER_Z):
+    window = int(window)
+    threshold = float(threshold)
+    if window < 2:
+        raise ValueError("window must be at least 2 laps")
+    if threshold <= 0:
+        raise ValueError("outlierThreshold must be positive")
+
+    key = stint_cache.session_key(filepath, window, threshold)
+    cached = stint_cache.get(key)
+    if cached is not None:
+        return cached
+
+    laps = _session_laps(con, filepath)
+    lap_numbers = np.array([lap["lapNumber"] for lap in laps], dtype=int)
+    times = np.array([lap["timeSeconds"] for lap in laps], dtype=float)
+    valid = np.array([lap["valid"] for lap in laps], dtype=bool)
+
+    if not laps:
+        pit_source = None
+        pit_in = pit_out = np.zeros(0, dtype=bool)
+    elif "In Pits" in list_channel_tables(con):
+        pit_source = "In Pits"
+        pit_in, pit_out = _pit_flags_from_channel(con, lap_numbers)
+    else:
+        pit_source = "lapTime"
+        pit_in, pit_out = _pit_flags_from_times(times, valid)
+
+    stint_ids = _stint_ids(pit_in, pit_out)
+    racing = valid & ~pit_in & ~pit_out
+    z = np.zeros_like(times)
+    outlier = np.zeros_like(valid)
+
+    stints = []
+    for stint in np.unique(stint_ids):
+        mask = stint_ids == stint
+        stint_z, stint_outlier, degradation, rolling, summary = _analyze_stint(
+            lap_numbers[mask], times[mask], racing[mask], window, threshold
+        )
+        z[mask] = stint_z
+        outlier[mask] = stint_outlier
+        stints.append({
+            "stint": int(stint) + 1,
+            "firstLap": int(lap_numbers[mask][0]),
+            "lastLap": int(lap_numbers[mask][-1]),
+            **summary,
+            "degradation": degradation,
+            "rollingConsistency": rolling,
+        })
+
+    result = {
+        "pitSource": pit_source,
+        "window": window,
+        "outlierThreshold": threshold,
+        "laps": [
+            {
+                **lap,
+                "stint": int(stint_ids[i]) + 1,
+                "pitIn": bool(pit_in[i]),
+                "pitOut": bool(pit_out[i]),
+                "outlier": bool(outlier[i]),
+                "robustZ": float(z[i]),
+            }
+            for i, lap in enumerate(laps)
+        ],
+        "stints": stints,
+    }
+    stint_cache.set(key, result)
+    return result
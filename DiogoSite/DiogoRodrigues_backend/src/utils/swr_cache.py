@@ -0,0 +1,133 @@
+"""
+Cache "stale-while-revalidate" para os dados do YouTube e das notícias.
+
+Cada chave tem dois prazos:
+   - soft_ttl: até aqui os dados são frescos e servidos diretamente.
+   - hard_ttl: entre soft e hard os dados são servidos na mesma (sem esperar)
+     e é agendada uma atualização em background.
+Depois do hard_ttl (ou sem dados) o pedido vai buscar à API e espera. Se a
+API falhar, servem-se os dados antigos que existirem (fallback).
+Os pedidos à API passam pelo single-flight: pedidos simultâneos à mesma
+chave (noutras threads ou noutros workers) partilham uma só chamada.
+Os dados ficam no backend configurado (ver cache_backends.py), que pode ser
+partilhado por todos os workers.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.cache_backends import create_backend
+from src.utils.single_flight import single_flight
+
+
+class CachePolicy:
+    def __init__(self, soft_ttl, hard_ttl):
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(hard_ttl, soft_ttl)
+
+
+class SWRCache:
+    # Só atualizamos em background chaves pedidas recentemente (não gastar quota sem visitas)
+    ACTIVE_WINDOW = 15 * 60
+
+    def __init__(self, backend=None, max_workers=2):
+        self.backend = backend or create_backend()
+        self._policies = {}
+        self._fetchers = {}
+        self._validators = {}
+        self._last_access = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cache-refresh")
+
+    def configure(self, key, policy, fetch, is_valid=None):
+        """
+        Regista a política de uma chave, a função que a vai buscar e (opcional)
+        a função que diz se a resposta é boa para guardar.
+        """
+        self._policies[key] = policy
+        self._fetchers[key] = fetch
+        self._validators[key] = is_valid or (lambda data: True)
+
+    def peek(self, key):
+        """Devolve (data, last_updated) sem lógica de expiração."""
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"Erro ao ler a cache '{key}' ({self.backend.name}): {e}")
+            entry = None
+        return entry if entry else (None, 0)
+
+    def set(self, key, data):
+        try:
+            self.backend.set(key, data, time.time())
+        except Exception as e:
+            logging.warning(f"Erro ao guardar a cache '{key}' ({self.backend.name}): {e}")
+
+    def get(self, key):
+        """
+        Devolve (data, ok). `ok` é False só quando não há dados nenhuns para servir
+        e a API falhou; nesse caso `data` é a resposta de erro da API (ou None).
+        """
+        is_valid = self._validators[key]
+        policy = self._policies[key]
+        now = time.time()
+        with self._lock:
+            self._last_access[key] = now
+
+        data, last_updated = self.peek(key)
+        age = now - last_updated
+        if data is not None and age < policy.soft_ttl:
+            return data, True
+        if data is not None and age < policy.hard_ttl:
+            self.refresh_async(key)
+            return data, True
+
+        fresh = self.refresh(key)
+        if fresh is not None and is_valid(fresh):
+            return fresh, True
+        # Fallback: dados antigos (mesmo depois do hard_ttl) são melhores do que um erro
+        if data is not None:
+            return data, True
+        return fresh, False
+
+    def refresh(self, key):
+        """Vai buscar a chave à API e guarda se o resultado for válido."""
+        try:
+            fresh = single_flight.do(key, self._fetchers[key])
+        except Exception as e:
+            logging.warning(f"Erro ao atualizar cache '{key}': {e}")
+            return None
+        if self._validators[key](fresh):
+            self.set(key, fresh)
+        return fresh
+
+    def refresh_async(self, key):
+        """Agenda uma atualização em background (no máximo uma por chave de cada vez)."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.refresh(key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def refresh_due(self):
+        """
+        Tarefa do agendador: atualiza em background as chaves que passaram o soft_ttl
+        e que foram pedidas na última ACTIVE_WINDOW.
+        """
+        now = time.time()
+        for key, policy in list(self._policies.items()):
+            _, last_updated = self.peek(key)
+            recently_used = now - self._last_access.get(key, 0) < self.ACTIVE_WINDOW
+            if recently_used and now - last_updated >= policy.soft_ttl:
+                self.refresh_async(key)
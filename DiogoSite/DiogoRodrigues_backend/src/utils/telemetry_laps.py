@@ -0,0 +1,277 @@
+"""
+Lap segmentation of LMU telemetry inside DuckDB.
+
+LMU stores each channel as its own table (`ts`, `value`) and marks every
+crossing of the start/finish line in `lmu.Lap`. Lap `n` runs from the n-th
+`Lap` timestamp to the next one; lap 0 is the out-lap.
+"""
+
+DEFAULT_LAP_CHANNELS = ["Ground Speed", "Throttle Pos", "Brake Pos", "Steering Pos"]
+DEFAULT_PERCENTILES = [5, 50, 95]
+# LMU writes a zero (or near-zero) official time for laps it invalidated
+MIN_OFFICIAL_SECONDS = 5
+# Official vs line-to-line time beyond this is reported as a diagnostic
+TIME_MISMATCH_SECONDS = 0.5
+
+# Lap index: one row per start/finish crossing, with the end of the lap from the next crossing
+LAP_INDEX_SQL = """
+    SELECT
+        (row_number() OVER (ORDER BY ts) - 1)::INTEGER AS lap,
+        ts AS lap_start,
+        LEAD(ts) OVER (ORDER BY ts) AS lap_end
+    FROM lmu.Lap
+"""
+
+
+def format_time(total_seconds):
+    if not isinstance(total_seconds, (int, float)) or total_seconds < 0:
+        return '0:00.000'
+    minutes = int(total_seconds // 60)
+    seconds = total_seconds % 60
+    return f"{minutes}:{seconds:06.3f}"
+
+
+def _lap_table_sql(tables):
+    """
+    One pass over the session: laps from LEAD over `Lap`, the official time
+    ASOF-joined to the end of each lap, sector splits from `Current Sector`
+    and session-wide bests/consistency as window aggregates over valid laps.
+    """
+    if "Lap Time" in tables:
+        official = 'SELECT ts, value::DOUBLE AS official FROM lmu."Lap Time"'
+    else:
+        official = "SELECT NULL::DOUBLE AS ts, NULL::DOUBLE AS official WHERE false"
+
+    if "Current Sector" in tables:
+        # Only sector changes matter; LMU numbers them 1, 2 and 0 (= sector 3)
+        sector_starts = f"""
+            SELECT
+                l.lap,
+                min(c.ts) FILTER (WHERE c.sector = 2) AS s2_start,
+                min(c.ts) FILTER (WHERE c.sector = 0) AS s3_start
+            FROM (
+                SELECT ts, value::INTEGER AS sector, lag(value::INTEGER) OVER (ORDER BY ts) AS previous
+                FROM lmu."Current Sector"
+            ) c
+            ASOF JOIN laps l ON c.ts >= l.lap_start
+            WHERE c.sector IS DISTINCT FROM c.previous
+            GROUP BY l.lap
+        """
+    else:
+        sector_starts = "SELECT NULL::INTEGER AS lap, NULL::DOUBLE AS s2_start, NULL::DOUBLE AS s3_start WHERE false"
+
+    return f"""
+        WITH laps AS ({LAP_INDEX_SQL}),
+        official AS ({official}),
+        sector_starts AS ({sector_starts}),
+        timed AS (
+            SELECT
+                l.lap, l.lap_start, l.lap_end,
+                l.lap_end - l.lap_start AS measured,
+                -- The official time is written just after the line is crossed; a sample
+                -- after the next lap's end belongs to that lap, so it is not reused here
+                CASE WHEN LEAD(l.lap_end) OVER (ORDER BY l.lap) IS NULL
+                          OR o.ts < LEAD(l.lap_end) OVER (ORDER BY l.lap)
+                     THEN o.official END AS official,
+                CASE WHEN l.lap_start < s.s2_start AND s.s2_start < s.s3_start AND s.s3_start < l.lap_end
+                     THEN s.s2_start END AS s2_start,
+                CASE WHEN l.lap_start < s.s2_start AND s.s2_start < s.s3_start AND s.s3_start < l.lap_end
+                     THEN s.s3_start END AS s3_start
+            FROM laps l
+            ASOF LEFT JOIN official o ON l.lap_end <= o.ts
+            LEFT JOIN sector_starts s ON s.lap = l.lap
+            WHERE l.lap_end IS NOT NULL
+        ),
+        classified AS (
+            SELECT
+                lap, measured, official,
+                coalesce(official > {MIN_OFFICIAL_SECONDS}, false) AS valid,
+                s2_start - lap_start AS sector1,
+                s3_start - s2_start AS sector2,
+                lap_end - s3_start AS sector3
+            FROM timed
+            WHERE lap >= 1
+        ),
+        timed_laps AS (
+            SELECT *, CASE WHEN valid THEN official ELSE measured END AS time_seconds
+            FROM classified
+        )
+        SELECT
+            lap, time_seconds, valid, official, measured, sector1, sector2, sector3,
+            count(*) FILTER (WHERE valid) OVER () AS valid_laps,
+            min(time_seconds) FILTER (WHERE valid) OVER () AS best,
+            avg(time_seconds) FILTER (WHERE valid) OVER () AS mean,
+            median(time_seconds) FILTER (WHERE valid) OVER () AS median,
+            stddev_samp(time_seconds) FILTER (WHERE valid) OVER () AS std_dev,
+            min(sector1) FILTER (WHERE valid) OVER () AS best_sector1,
+            min(sector2) FILTER (WHERE valid) OVER () AS best_sector2,
+            min(sector3) FILTER (WHERE valid) OVER () AS best_sector3
+        FROM timed_laps
+        ORDER BY lap
+    """
+
+
+def _lap_rows(con):
+    tables = list_channel_tables(con)
+    if "Lap" not in tables:
+        return [], tables
+    return con.execute(_lap_table_sql(tables)).fetchall(), tables
+
+
+def compute_laps(con):
+    """Lap list shown by the frontend: flying laps with official or measured time."""
+    rows, _ = _lap_rows(con)
+    return [
+        {
+            "lapNumber": lap,
+            "timeSeconds": time_seconds,
+            "formatted": format_time(time_seconds),
+            "valid": valid,
+        }
+        for lap, time_seconds, valid, *_ in rows
+    ]
+
+
+def _diagnostics(official, measured, sectors, has_sectors):
+    issues = []
+    if official is None:
+        issues.append("missingOfficialTime")
+    elif official <= MIN_OFFICIAL_SECONDS:
+        issues.append("invalidatedByGame")
+    elif abs(official - measured) > TIME_MISMATCH_SECONDS:
+        issues.append("officialMeasuredMismatch")
+    if has_sectors and None in sectors:
+        issues.append("missingSectors")
+    return issues
+
+
+def lap_report(con):
+    """
+    Lap list with sector splits and validity diagnostics, plus the theoretical
+    best (sum of the best valid sectors) and consistency of the valid laps.
+    """
+    rows, tables = _lap_rows(con)
+    has_sectors = "Current Sector" in tables
+
+    laps = []
+    for lap, time_seconds, valid, official, measured, *sectors_and_stats in rows:
+        sectors = sectors_and_stats[:3]
+        laps.append({
+            "lapNumber": lap,
+            "timeSeconds": time_seconds,
+            "formatted": format_time(time_seconds),
+            "valid": valid,
+            "officialSeconds": official,
+            "measuredSeconds": measured,
+            "sectors": sectors,
+            "diagnostics": _diagnostics(official, measured, sectors, has_sectors),
+        })
+
+    valid_laps, best, mean, median, std_dev, *best_sectors = rows[0][8:] if rows else (0, None, None, None, None)
+    theoretical_best = sum(best_sectors) if best_sectors and None not in best_sectors else None
+    return {
+        "laps": laps,
+        "bestSectors": best_sectors or [None, None, None],
+        "theoreticalBest": theoretical_best,
+        "theoreticalBestFormatted": format_time(theoretical_best) if theoretical_best is not None else None,
+        "consistency": {
+            "validLaps": valid_laps,
+            "bestSeconds": best,
+            "meanSeconds": mean,
+            "medianSeconds": median,
+            "stdDevSeconds": std_dev,
+            # Spread relative to the average lap, in percent
+            "coefficientOfVariation": 100 * std_dev / mean if std_dev is not None and mean else None,
+        },
+    }
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def list_channel_tables(con):
+    """Maps every table of the attached session to its column names."""
+    rows = con.execute(
+        """
+        SELECT table_name, list(column_name ORDER BY ordinal_position)
+        FROM information_schema.columns
+        WHERE table_catalog = 'lmu'
+        GROUP BY table_name
+        """
+    ).fetchall()
+    return {name: columns for name, columns in rows}
+
+
+def resolve_channels(con, channels, value_column="value"):
+    """
+    Validates channel names against the session catalog.
+    Raises ValueError when a channel does not exist or is not a (ts, value) series.
+    """
+    tables = list_channel_tables(con)
+    missing = [name for name in channels if name not in tables]
+    if missing:
+        raise ValueError(f"Unknown channels: {', '.join(missing)}")
+    not_series = [name for name in channels if not {"ts", value_column} <= set(tables[name])]
+    if not_series:
+        raise ValueError(f"Channels without ts/{value_column} columns: {', '.join(not_series)}")
+    return list(channels)
+
+
+def default_channels(con):
+    tables = list_channel_tables(con)
+    return [name for name in DEFAULT_LAP_CHANNELS if name in tables]
+
+
+def lap_channel_stats(con, channels, percentiles=None, laps=None):
+    """
+    Per-lap min/max/mean/percentiles for `channels`, computed in one query:
+    every channel sample is ASOF-joined to the lap that started before it.
+    """
+    percentiles = DEFAULT_PERCENTILES if percentiles is None else percentiles
+    for pct in percentiles:
+        if not 0 <= pct <= 100:
+            raise ValueError(f"Percentile out of range: {pct}")
+    fractions = ", ".join(str(pct / 100) for pct in percentiles) or "0.5"
+
+    samples = " UNION ALL ".join(
+        f"SELECT {idx} AS channel_idx, ts, value::DOUBLE AS value FROM lmu.{quote_ident(name)}"
+        for idx, name in enumerate(channels)
+    )
+    lap_filter = ""
+    params = []
+    if laps:
+        lap_filter = "WHERE l.lap IN (SELECT unnest(?::INTEGER[]))"
+        params.append([int(lap) for lap in laps])
+
+    rows = con.execute(
+        f"""
+        WITH laps AS ({LAP_INDEX_SQL}),
+        samples AS ({samples})
+        SELECT
+            l.lap, l.lap_start, l.lap_end, s.channel_idx,
+            count(s.value), min(s.value), max(s.value), avg(s.value),
+            quantile_cont(s.value, [{fractions}])
+        FROM samples s
+        ASOF JOIN laps l ON s.ts >= l.lap_start
+        {lap_filter}
+        GROUP BY ALL
+        ORDER BY l.lap, s.channel_idx
+        """,
+        params,
+    ).fetchall()
+
+    by_lap = {}
+    for lap, lap_start, lap_end, channel_idx, count, vmin, vmax, vmean, quantiles in rows:
+        entry = by_lap.setdefault(lap, {
+            "lapNumber": lap,
+            "start": lap_start,
+            "end": lap_end,
+            "complete": lap_end is not None,
+            "channels": {},
+        })
+        stats = {"count": count, "min": vmin, "max": vmax, "mean": vmean}
+        for pct, value in zip(percentiles, quantiles or []):
+            stats[f"p{pct:g}"] = value
+        entry["channels"][channels[channel_idx]] = stats
+    return list(by_lap.values())
@@ -0,0 +1,142 @@
+"""
+Streaming encoders for /telemetry/query results.
+
+Every encoder reads the DuckDB result batch by batch (a row-capped
+query_governor.CappedResult) and yields bytes as soon as a batch is encoded,
+so the full result is never materialized in the process.
+
+When the row cap cut the result, the JSON formats say so in-band (a last
+NDJSON line `{"truncated": true, "rowLimit": N}`, the same keys in the
+columns object) and Parquet in its key-value metadata; an Arrow stream has
+no room for it, so the client compares its row count with the
+X-Result-Row-Limit header. If reading or encoding fails halfway, the JSON
+formats end with an in-band error (`{"error": ...}` as the last NDJSON line,
+an `"error"` key in the columns object). Arrow and Parquet streams are simply
+cut short: without the end-of-stream marker / footer a reader rejects them as
+incomplete.
+"""
+
+import io
+import logging
+
+import duckdb
+
+from src.utils.json_serialize import dataframe_to_columns, dataframe_to_records, json_dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the binary formats
+    pa = None
+    pq = None
+
+STREAM_FORMATS = {
+    "columns": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+BINARY_FORMATS = ("arrow", "parquet")
+
+
+def _truncation(result):
+    return {"truncated": True, "rowLimit": result.max_rows}
+
+
+def _encode_ndjson(result):
+    for chunk in result:
+        rows = dataframe_to_records(chunk)
+        if rows:
+            yield ("\n".join(json_dumps(row) for row in rows) + "\n").encode("utf-8")
+    if result.truncated:
+        yield (json_dumps(_truncation(result)) + "\n").encode("utf-8")
+
+
+def _encode_columns(result):
+    names = [col[0] for col in result.schema]
+    types = [str(col[1]) for col in result.schema]
+    yield f'{{"columns":{json_dumps(names)},"types":{json_dumps(types)},"chunks":['.encode("utf-8")
+    first = True
+    for chunk in result:
+        if chunk.empty:
+            continue
+        block = dataframe_to_columns(chunk)
+        yield (("" if first else ",") + json_dumps(block)).encode("utf-8")
+        first = False
+    if result.truncated:
+        yield f'],"truncated":true,"rowLimit":{result.max_rows}}}'.encode("utf-8")
+    else:
+        yield b"]}"
+
+
+def _encode_arrow(result):
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, result.schema) as writer:
+        for batch in result:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _encode_parquet(result):
+    sink = io.BytesIO()
+    with pq.ParquetWriter(sink, result.schema) as writer:
+        for batch in result:
+            writer.write_batch(batch)
+            yield _drain(sink)
+        if result.truncated:
+            writer.add_key_value_metadata({key: str(value).lower() for key, value in _truncation(result).items()})
+    yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate(0)
+    return data
+
+
+_ENCODERS = {
+    "columns": _encode_columns,
+    "ndjson": _encode_ndjson,
+    "arrow": _encode_arrow,
+    "parquet": _encode_parquet,
+}
+
+
+def format_available(fmt):
+    return fmt not in BINARY_FORMATS or pa is not None
+
+
+def uses_arrow(fmt):
+    """Whether the result of `fmt` is read as Arrow record batches rather than DataFrames."""
+    return fmt in BINARY_FORMATS
+
+
+def _error_trailer(fmt, message, started):
+    if fmt == "ndjson":
+        return (json_dumps({"error": message}) + "\n").encode("utf-8")
+    if fmt == "columns":
+        if not started:
+            return json_dumps({"error": message}).encode("utf-8")
+        # Closes the "chunks" array the error interrupted, then adds the error key
+        return f'],"error":{json_dumps(message)}}}'.encode("utf-8")
+    return b""
+
+
+def stream_result(result, fmt):
+    """Yields the encoded `result` (a CappedResult read in `fmt`'s chunk type, see uses_arrow)."""
+    started = False
+    try:
+        for data in _ENCODERS[fmt](result):
+            if data:
+                started = True
+                yield data
+    except Exception as e:
+        logging.error(f"Streaming of a {fmt} query result failed: {e}", exc_info=True)
+        if isinstance(e, duckdb.InterruptException):
+            message = "Query exceeded the streaming time limit"
+        else:
+            message = f"Result stream interrupted: {e}"
+        yield _error_trailer(fmt, message, started)
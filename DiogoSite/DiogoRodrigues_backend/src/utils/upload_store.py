@@ -0,0 +1,289 @@
+"""
+Content-addressed storage of uploaded telemetry files.
+
+Uploads are streamed to disk while their SHA-256 is computed and stored as
+`<sha256>.duckdb`, so the same session uploaded twice (or from several
+machines) is kept and analyzed once. Every upload adds a reference with its
+timestamp in `<session>.refs.json`; the file is only deleted once all of its
+references are older than the retention window.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from src.utils.duckdb_pool import telemetry_pool
+from src.utils.lru_cache import invalidate_session
+from src.utils.session_summary import SUMMARY_SUFFIX, discard_summary
+
+REFS_SUFFIX = '.refs.json'
+SESSION_SUFFIX = '.duckdb'
+PART_SUFFIX = '.part'
+MANIFEST_SUFFIX = '.upload.json'
+JOB_SUFFIX = '.job.json'
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Chunk size suggested to clients of the chunked upload protocol
+CHUNKED_UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("TELEMETRY_MAX_UPLOAD_MB", 2048)) * 1024 * 1024
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Files stored next to a session that live and die with it
+SIDECAR_SUFFIXES = (SUMMARY_SUFFIX, REFS_SUFFIX, JOB_SUFFIX)
+
+_refs_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Client-facing error of the chunked upload protocol, with its HTTP status."""
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def refs_path(filepath):
+    return filepath + REFS_SUFFIX
+
+
+def is_session_sidecar(filename):
+    return filename.endswith(SIDECAR_SUFFIXES)
+
+
+def session_path_for(sidecar_path):
+    for suffix in SIDECAR_SUFFIXES:
+        if sidecar_path.endswith(suffix):
+            return sidecar_path[:-len(suffix)]
+    return sidecar_path
+
+
+def store_upload(stream, upload_folder):
+    """
+    Streams an upload to disk, hashing it on the way.
+    Returns (filename, already_present); the filename is `<sha256>.duckdb`.
+    """
+    part_path = os.path.join(upload_folder, uuid.uuid4().hex + PART_SUFFIX)
+    digest = hashlib.sha256()
+    try:
+        with open(part_path, 'wb') as f:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        return commit_upload(part_path, digest.hexdigest(), upload_folder)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def commit_upload(part_path, sha256, upload_folder):
+    """Moves a fully written upload to its content-addressed name and adds a reference."""
+    filename = sha256 + SESSION_SUFFIX
+    filepath = os.path.join(upload_folder, filename)
+    already_present = os.path.exists(filepath)
+    if already_present:
+        os.remove(part_path)
+    else:
+        os.replace(part_path, filepath)
+    add_reference(filepath)
+    return filename, already_present
+
+
+def _read_refs(filepath):
+    try:
+        with open(refs_path(filepath), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_refs(filepath, refs):
+    path = refs_path(filepath)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(refs, f)
+    os.replace(tmp_path, path)
+
+
+def add_reference(filepath):
+    with _refs_lock:
+        refs = _read_refs(filepath) or []
+        refs.append(time.time())
+        _write_refs(filepath, refs)
+
+
+def session_expired(filepath, now, retention_seconds):
+    """
+    True when every reference to the session is older than the retention window.
+    Files without references (older uploads, partial chunks) fall back to their mtime.
+    """
+    with _refs_lock:
+        refs = _read_refs(filepath)
+        if refs is None:
+            return (now - os.path.getmtime(filepath)) > retention_seconds
+
+        live = [ts for ts in refs if (now - ts) <= retention_seconds]
+        if live and len(live) != len(refs):
+            _write_refs(filepath, live)
+        return not live
+
+
+def release_session(filepath):
+    """Closes the pooled connection, drops cached results and deletes the session file with its sidecars."""
+    telemetry_pool.close(filepath)
+    invalidate_session(filepath)
+    os.remove(filepath)
+    discard_summary(filepath)
+    for sidecar in (refs_path(filepath), filepath + JOB_SUFFIX):
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+
+
+# ============================================================
+# CHUNKED / RESUMABLE UPLOADS
+# ============================================================
+#
+# init     -> creates `<upload_id>.part` and its `<upload_id>.upload.json` manifest
+# chunk    -> appends bytes at an explicit offset (must equal the bytes received so far)
+# status   -> bytes received, so a client can resume after a failure
+# finalize -> checks size and SHA-256, then stores the file like a normal upload
+#
+# All state lives in UPLOAD_FOLDER, so any worker can serve any step. Abandoned
+# uploads are removed by cleanup_old_files like any other stale file.
+
+def _upload_paths(upload_folder, upload_id):
+    if not _UPLOAD_ID_RE.match(upload_id or ''):
+        raise UploadError("Invalid upload id", 400)
+    base = os.path.join(upload_folder, upload_id)
+    return base + PART_SUFFIX, base + MANIFEST_SUFFIX
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise UploadError("Upload not found or expired", 404)
+
+
+@contextmanager
+def _locked_upload(manifest_path):
+    """
+    Holds an exclusive fcntl lock on the upload's manifest, so the checks and
+    writes of one request never interleave with another request for the same
+    upload, in this worker or any other. Without fcntl (Windows) there is no lock.
+    """
+    try:
+        lock_file = open(manifest_path, 'r', encoding='utf-8')
+    except OSError:
+        raise UploadError("Upload not found or expired", 404)
+    with lock_file:
+        if fcntl is not None:
+            # Blocks while a slow request for the same upload is still writing
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def init_chunked_upload(upload_folder, size, sha256=None):
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError("A positive file size is required", 400)
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadError(f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)", 413)
+    if sha256 is not None and not re.match(r'^[0-9a-fA-F]{64}$', sha256):
+        raise UploadError("Invalid sha256", 400)
+
+    upload_id = uuid.uuid4().hex
+    part_path, manifest_path = _upload_paths(upload_folder, upload_id)
+    open(part_path, 'wb').close()
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({"size": size, "sha256": sha256.lower() if sha256 else None, "created": time.time()}, f)
+    return {"upload_id": upload_id, "chunk_size": CHUNKED_UPLOAD_CHUNK_BYTES, "received": 0, "size": size}
+
+
+def chunked_upload_status(upload_folder, upload_id):
+    part_path, manifest_path = _upload_paths(upload_folder, upload_id)
+    manifest = _read_manifest(manifest_path)
+    if not os.path.exists(part_path):
+        raise UploadError("Upload not found or expired", 404)
+    return {"upload_id": upload_id, "received": os.path.getsize(part_path), "size": manifest["size"]}
+
+
+def append_chunk(upload_folder, upload_id, offset, stream, chunk_sha256=None):
+    """
+    Writes one chunk straight from the request stream to the .part file.
+    The offset must match the bytes already received; a mismatch returns the
+    current size so the client can resume from there. A retry that overlaps
+    the original request waits for it under the upload lock, then gets that
+    mismatch instead of writing the same bytes concurrently.
+    """
+    part_path, manifest_path = _upload_paths(upload_folder, upload_id)
+    with _locked_upload(manifest_path):
+        manifest = _read_manifest(manifest_path)
+        if not os.path.exists(part_path):
+            raise UploadError("Upload not found or expired", 404)
+        received = os.path.getsize(part_path)
+        if offset != received:
+            raise UploadError("Offset does not match the bytes received", 409, received=received)
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            while True:
+                block = stream.read(UPLOAD_CHUNK_BYTES)
+                if not block:
+                    break
+                written += len(block)
+                if offset + written > manifest["size"]:
+                    f.truncate(offset)
+                    raise UploadError("Chunk goes past the declared file size", 400, received=offset)
+                digest.update(block)
+                f.write(block)
+
+            if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+                # Drop the corrupted chunk so the client can resend it
+                f.truncate(offset)
+                raise UploadError("Chunk checksum mismatch", 422, received=offset)
+
+        # Keeps the manifest alive for as long as chunks keep arriving
+        os.utime(manifest_path)
+    return {"upload_id": upload_id, "received": offset + written, "size": manifest["size"]}
+
+
+def finalize_chunked_upload(upload_folder, upload_id):
+    """Verifies a complete chunked upload and stores it. Returns (filename, already_present)."""
+    part_path, manifest_path = _upload_paths(upload_folder, upload_id)
+    # Under the upload lock, so no chunk is still being written while the file is hashed
+    with _locked_upload(manifest_path):
+        manifest = _read_manifest(manifest_path)
+        if not os.path.exists(part_path):
+            raise UploadError("Upload not found or expired", 404)
+
+        received = os.path.getsize(part_path)
+        if received != manifest["size"]:
+            raise UploadError("Upload incomplete", 409, received=received, size=manifest["size"])
+
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        if manifest["sha256"] and sha256 != manifest["sha256"]:
+            raise UploadError("File checksum mismatch", 422, received=received)
+
+        result = commit_upload(part_path, sha256, upload_folder)
+        os.remove(manifest_path)
+    return result
@@ -1,131 +1,208 @@
-import os
-import requests
-
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-CHANNEL_HANDLE = os.getenv("CHANNEL_HANDLE", "@FulLShoT")
-BASE_URL = "https://www.googleapis.com/youtube/v3"
-
-def get_channel_id():
-    """Obtém o channelId diretamente do handle"""
-    if not YOUTUBE_API_KEY:
-        raise Exception("YOUTUBE_API_KEY não definida")
-    
-    try:
-        response = requests.get(
-            f"{BASE_URL}/channels",
-            params={
-                "part": "id",
-                "forHandle": CHANNEL_HANDLE,
-                "key": YOUTUBE_API_KEY,
-            },
-            timeout=10,
-        )
-        response.raise_for_status()
-        data = response.json()
-        if not data.get("items"):
-            raise Exception("Canal não encontrado")
-        return data["items"][0]["id"]
-    except Exception as e:
-        raise Exception(f"Erro ao obter channelId: {e}")
-
-def get_channel_info():
-    """Obtém estatísticas do canal (Subs, Views)"""
-    if not YOUTUBE_API_KEY:
-        return {"error": "YOUTUBE_API_KEY não definida"}
-    
-    try:
-        response = requests.get(
-            f"{BASE_URL}/channels",
-            params={
-                "part": "snippet,statistics,brandingSettings",
-                "forHandle": CHANNEL_HANDLE,
-                "key": YOUTUBE_API_KEY,
-            },
-            timeout=10,
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        if not data.get("items"):
-            return {"error": "Canal não encontrado"}
-            
-        channel = data["items"][0]
-        return {
-            "title": channel["snippet"]["title"],
-            "description": channel["snippet"]["description"],
-            "thumbnails": channel["snippet"]["thumbnails"],
-            "stats": channel["statistics"],
-            "banner": channel.get("brandingSettings", {}).get("image", {}),
-        }
-    except Exception as e:
-        return {"error": str(e)}
-
-def get_live_status():
-    """Verifica se há live ativa e devolve os dados (ID e Título)"""
-    if not YOUTUBE_API_KEY:
-        return {"error": "YOUTUBE_API_KEY não definida"}
-
-    try:
-        channel_id = get_channel_id()
-        response = requests.get(
-            f"{BASE_URL}/search",
-            params={
-                "part": "snippet",
-                "channelId": channel_id,
-                "eventType": "live",
-                "type": "video",
-                "key": YOUTUBE_API_KEY,
-            },
-            timeout=10,
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        items = data.get("items", [])
-        if len(items) > 0:
-            live_video = items[0]
-            return {
-                "is_live": True,
-                "id": live_video["id"]["videoId"],
-                "title": live_video["snippet"]["title"]
-            }
-        
-        return {"is_live": False}
-
-    except Exception as e:
-        return {"error": str(e)}
-
-def get_latest_videos(limit=6):
-    """Obtém os últimos vídeos do canal"""
-    if not YOUTUBE_API_KEY:
-        return {"error": "YOUTUBE_API_KEY não definida"}
-    
-    try:
-        channel_id = get_channel_id()
-        response = requests.get(
-            f"{BASE_URL}/search",
-            params={
-                "part": "snippet",
-                "channelId": channel_id,
-                "order": "date",
-                "maxResults": limit,
-                "key": YOUTUBE_API_KEY,
-                "type": "video" # Garante que só vêm vídeos, não playlists
-            },
-            timeout=10,
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        videos = []
-        for item in data.get("items", []):
-            if item["id"]["kind"] == "youtube#video":
-                videos.append({
-                    "id": item["id"]["videoId"],
-                    "title": item["snippet"]["title"],
-                    "thumbnail": item["snippet"]["thumbnails"]["high"]["url"],
-                    "publishedAt": item["snippet"]["publishedAt"],
-                })
-        return {"videos": videos}
-    except Exception as e:
-        return {"error": str(e)}
+import os
+import logging
+import threading
+from src.utils import http_client
+from src.utils.cache_backends import create_backend
+
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+CHANNEL_HANDLE = os.getenv("CHANNEL_HANDLE", "@FulLShoT")
+BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+# Quantos uploads recentes vemos para encontrar uma live a decorrer
+LIVE_LOOKBACK = 5
+MAX_RESULTS = 50  # Limite da API por página / por pedido de videos.list
+# Vídeos a mais pedidos para compensar as lives agendadas que são descartadas (o custo é o mesmo)
+UPCOMING_MARGIN = 5
+
+# O handle -> (channelId, playlist de uploads) nunca muda: resolve-se uma vez
+# e guarda-se no backend de cache (sobrevive a reinícios e é partilhado pelos workers)
+_ids_lock = threading.Lock()
+_channel_ids = None
+_ids_store = None
+
+
+def _api_get(endpoint, params):
+    """
+    GET à YouTube Data API pela sessão partilhada (keep-alive, retries e ETag:
+    se o recurso não mudou vem um 304 e usa-se o JSON guardado).
+    """
+    return http_client.get_json(
+        f"{BASE_URL}/{endpoint}",
+        params={**params, "key": YOUTUBE_API_KEY},
+        timeout=10,
+        name=f"youtube.{endpoint}",
+        cache_key_params=params,
+    )
+
+
+def _ids_cache_key():
+    return f"channel_ids:{CHANNEL_HANDLE.lower()}"
+
+
+def _ids_backend():
+    global _ids_store
+    if _ids_store is None:
+        _ids_store = create_backend()
+    return _ids_store
+
+
+def _remember_channel_ids(channel):
+    """Guarda o ID e a playlist de uploads de um recurso 'channel' da API."""
+    global _channel_ids
+    ids = {
+        "id": channel["id"],
+        "uploads": channel.get("contentDetails", {}).get("relatedPlaylists", {}).get("uploads"),
+    }
+    if not ids["uploads"]:
+        return ids
+    _channel_ids = ids
+    try:
+        _ids_backend().set(_ids_cache_key(), ids)
+    except Exception as e:
+        logging.warning(f"Não foi possível guardar o channelId: {e}")
+    return ids
+
+
+def fetch_channel():
+    """
+    Um só pedido channels.list com tudo o que precisamos do canal
+    (estatísticas, branding e a playlist de uploads). Custa 1 ponto.
+    """
+    data = _api_get("channels", {
+        "part": "snippet,statistics,brandingSettings,contentDetails",
+        "forHandle": CHANNEL_HANDLE,
+    })
+    if not data.get("items"):
+        raise Exception("Canal não encontrado")
+    channel = data["items"][0]
+    _remember_channel_ids(channel)
+    return channel
+
+
+def get_channel_ids():
+    """channelId e playlist de uploads: memória -> cache persistente -> API (só a 1ª vez)."""
+    global _channel_ids
+    if not YOUTUBE_API_KEY:
+        raise Exception("YOUTUBE_API_KEY não definida")
+
+    with _ids_lock:
+        if _channel_ids:
+            return _channel_ids
+        try:
+            stored = _ids_backend().get(_ids_cache_key())
+        except Exception as e:
+            logging.warning(f"Não foi possível ler o channelId guardado: {e}")
+            stored = None
+        if stored and stored[0].get("uploads"):
+            _channel_ids = stored[0]
+            return _channel_ids
+
+        try:
+            ids = _remember_channel_ids(fetch_channel())
+        except Exception as e:
+            raise Exception(f"Erro ao obter channelId: {e}")
+        if not ids["uploads"]:
+            raise Exception("Canal sem playlist de uploads")
+        return ids
+
+
+def get_channel_id():
+    """Obtém o channelId diretamente do handle (memorizado)"""
+    return get_channel_ids()["id"]
+
+
+def _recent_videos(count):
+    """
+    Últimos `count` uploads do canal: playlistItems (1 ponto) + um videos.list
+    em lote com os detalhes (1 ponto), em vez do search (100 pontos).
+    """
+    uploads = get_channel_ids()["uploads"]
+    count = max(1, min(int(count), MAX_RESULTS))
+    playlist = _api_get("playlistItems", {
+        "part": "contentDetails",
+        "playlistId": uploads,
+        "maxResults": count,
+    })
+    video_ids = [item["contentDetails"]["videoId"] for item in playlist.get("items", [])]
+    if not video_ids:
+        return []
+
+    details = _api_get("videos", {
+        "part": "snippet",
+        "id": ",".join(video_ids),
+        "maxResults": MAX_RESULTS,
+    })
+    by_id = {video["id"]: video for video in details.get("items", [])}
+    # Mantém a ordem da playlist (mais recentes primeiro)
+    return [by_id[video_id] for video_id in video_ids if video_id in by_id]
+
+
+def _thumbnail_url(thumbnails):
+    for size in ("high", "medium", "default"):
+        if size in thumbnails:
+            return thumbnails[size]["url"]
+    return None
+
+
+def get_channel_info():
+    """Obtém estatísticas do canal (Subs, Views)"""
+    if not YOUTUBE_API_KEY:
+        return {"error": "YOUTUBE_API_KEY não definida"}
+
+    try:
+        channel = fetch_channel()
+        return {
+            "title": channel["snippet"]["title"],
+            "description": channel["snippet"]["description"],
+            "thumbnails": channel["snippet"]["thumbnails"],
+            "stats": channel["statistics"],
+            "banner": channel.get("brandingSettings", {}).get("image", {}),
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+def get_live_status():
+    """Verifica se há live ativa e devolve os dados (ID e Título)"""
+    if not YOUTUBE_API_KEY:
+        return {"error": "YOUTUBE_API_KEY não definida"}
+
+    try:
+        # Uma live a decorrer aparece nos uploads com liveBroadcastContent = "live"
+        for video in _recent_videos(LIVE_LOOKBACK):
+            if video["snippet"].get("liveBroadcastContent") == "live":
+                return {
+                    "is_live": True,
+                    "id": video["id"],
+                    "title": video["snippet"]["title"]
+                }
+
+        return {"is_live": False}
+
+    except Exception as e:
+        return {"error": str(e)}
+
+def get_latest_videos(limit=6):
+    """
+    Obtém os últimos `limit` vídeos do canal, sem lives agendadas. Pede alguns a
+    mais para a lista não ficar curta; só vem com menos se houver mais de
+    UPCOMING_MARGIN lives agendadas seguidas (ou o canal tiver menos vídeos).
+    """
+    if not YOUTUBE_API_KEY:
+        return {"error": "YOUTUBE_API_KEY não definida"}
+
+    try:
+        videos = []
+        for video in _recent_videos(limit + UPCOMING_MARGIN):
+            snippet = video["snippet"]
+            # Lives agendadas ainda não têm conteúdo
+            if snippet.get("liveBroadcastContent") == "upcoming":
+                continue
+            videos.append({
+                "id": video["id"],
+                "title": snippet["title"],
+                "thumbnail": _thumbnail_url(snippet.get("thumbnails", {})),
+                "publishedAt": snippet["publishedAt"],
+            })
+        return {"videos": videos[:limit]}
+    except Exception as e:
+        return {"error": str(e)}
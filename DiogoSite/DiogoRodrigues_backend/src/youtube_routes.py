@@ -1,118 +1,114 @@
-"""
-🔴 REGRAS DESTE MÓDULO (NÃO REMOVER LÓGICA):
-   1. CACHE OBRIGATÓRIO: Todas as rotas (videos, live, channel) TÊM de verificar a cache global antes de chamar a API.
-   2. QUOTA DO YOUTUBE: A busca de vídeos e live custa 100 pontos. Não remover a lógica de 'CACHE_DURATION_VIDEOS' (30 min).
-   3. FALLBACK: Se a API der erro (ex: quota excedida), o código deve tentar servir os dados antigos da cache em vez de falhar.
-   4. LIMITES: Manter o parametro 'limit' nos videos para não trazer o canal todo.
-"""
-
-import time
-from flask import Blueprint, jsonify, request
-from src.utils.youtube_api import (
-    get_channel_info,
-    get_live_status,
-    get_latest_videos,
-)
-from src.utils.news_api import get_simracing_news
-
-youtube_bp = Blueprint("youtube", __name__)
-
-# ============================================================
-# 🧠 SISTEMA DE CACHE (Memória Temporária)
-# ============================================================
-CACHE_DURATION_VIDEOS = 30 * 60  # 30 min (Poupa muita quota!)
-CACHE_DURATION_NEWS = 15 * 60    # 15 min
-CACHE_DURATION_LIVE = 2 * 60     # 2 min (Para detetar lives rápido)
-
-# A nossa "Base de Dados" na memória RAM
-cache = {
-    "videos": {"data": None, "last_updated": 0},
-    "live": {"data": None, "last_updated": 0},
-    "channel": {"data": None, "last_updated": 0},
-    "news": {"data": None, "last_updated": 0}
-}
-
-# ============================================================
-# 🚦 ROTAS (Com Proteção de Cache)
-# ============================================================
-
-@youtube_bp.route("/channel-info", methods=["GET"])
-def channel_info():
-    current_time = time.time()
-    
-    # 1. Verifica Cache
-    if cache["channel"]["data"] and (current_time - cache["channel"]["last_updated"] < CACHE_DURATION_VIDEOS):
-        return jsonify(cache["channel"]["data"])
-
-    # 2. Se expirou, vai à API
-    data = get_channel_info()
-    if "error" not in data:
-        cache["channel"]["data"] = data
-        cache["channel"]["last_updated"] = current_time
-        return jsonify(data)
-    
-    # 3. Fallback
-    if cache["channel"]["data"]:
-        return jsonify(cache["channel"]["data"])
-        
-    return jsonify(data), 500
-
-@youtube_bp.route("/live-status", methods=["GET"])
-def live_status():
-    current_time = time.time()
-
-    if cache["live"]["data"] and (current_time - cache["live"]["last_updated"] < CACHE_DURATION_LIVE):
-        return jsonify(cache["live"]["data"])
-
-    data = get_live_status()
-    if "error" not in data:
-        cache["live"]["data"] = data
-        cache["live"]["last_updated"] = current_time
-        return jsonify(data)
-
-    return jsonify(data), 500
-
-@youtube_bp.route("/latest-videos", methods=["GET"])
-def latest_videos():
-    current_time = time.time()
-    limit = int(request.args.get("limit", 6))
-
-    # 1. Verifica Cache (CRÍTICO: A busca custa 100 pontos!)
-    if cache["videos"]["data"] and (current_time - cache["videos"]["last_updated"] < CACHE_DURATION_VIDEOS):
-        print(" ⚡ (CACHE) A servir vídeos da memória...")
-        return jsonify(cache["videos"]["data"])
-
-    print(" 🐢 (API) A gastar quota do YouTube...")
-    data = get_latest_videos(limit)
-    
-    if "error" not in data:
-        cache["videos"]["data"] = data
-        cache["videos"]["last_updated"] = current_time
-        return jsonify(data)
-    
-    # Fallback de segurança
-    if cache["videos"]["data"]:
-        print(" ⚠️ Erro na API, a servir cache antiga de segurança.")
-        return jsonify(cache["videos"]["data"])
-
-    return jsonify(data), 500
-
-@youtube_bp.route("/simracing-news", methods=["GET"])
-def simracing_news():
-    current_time = time.time()
-
-    if cache["news"]["data"] and (current_time - cache["news"]["last_updated"] < CACHE_DURATION_NEWS):
-        print(" ⚡ (CACHE) A servir notícias...")
-        return jsonify(cache["news"]["data"])
-
-    print(" 🐢 (RSS) A buscar notícias frescas...")
-    try:
-        fresh_data = get_simracing_news()
-        cache["news"]["data"] = fresh_data
-        cache["news"]["last_updated"] = current_time
-        return jsonify(fresh_data)
-    except Exception as e:
-        print(f"Erro notícias: {e}")
-        if cache["news"]["data"]:
-            return jsonify(cache["news"]["data"])
-        return jsonify({"error": "Falha ao obter notícias"}), 500
\ No newline at end of file
+"""
+🔴 REGRAS DESTE MÓDULO (NÃO REMOVER LÓGICA):
+   1. CACHE OBRIGATÓRIO: Todas as rotas (videos, live, channel) TÊM de verificar a cache global antes de chamar a API.
+   2. QUOTA DO YOUTUBE: Vídeos e live usam playlistItems + videos.list (1 ponto cada, 2 por atualização), nunca o search (100 pontos).
+      Não remover a lógica de 'CACHE_DURATION_VIDEOS' (30 min): os visitantes não esperam pela API e a quota
+      diária fica com folga para a live, que é atualizada a cada 'CACHE_DURATION_LIVE' (2 min).
+   3. FALLBACK: Se a API der erro (ex: quota excedida), o código deve tentar servir os dados antigos da cache em vez de falhar.
+   4. LIMITES: Manter o parametro 'limit' nos videos para não trazer o canal todo.
+"""
+
+import os
+from flask import Blueprint, jsonify, request
+from src.utils.youtube_api import (
+    get_channel_info,
+    get_live_status,
+    get_latest_videos,
+)
+from src.utils.news_api import get_feeds_health, get_simracing_news
+from src.utils.http_client import metrics as http_metrics
+from src.utils.swr_cache import CachePolicy, SWRCache
+
+youtube_bp = Blueprint("youtube", __name__)
+
+# ============================================================
+# 🧠 SISTEMA DE CACHE (Stale-While-Revalidate)
+# ============================================================
+# Até ao CACHE_DURATION_* os dados são frescos. Depois disso, e até ao
+# CACHE_HARD_TTL_*, continuam a ser servidos na hora enquanto uma thread
+# em background vai buscar dados novos. Os visitantes nunca esperam pela API
+# a não ser que a cache esteja vazia ou muito antiga.
+CACHE_DURATION_VIDEOS = int(os.getenv("CACHE_DURATION_VIDEOS", 30 * 60))  # 30 min (vídeos novos são raros)
+CACHE_DURATION_NEWS = int(os.getenv("CACHE_DURATION_NEWS", 5 * 60))       # 5 min (só lê os feeds que estão na hora)
+CACHE_DURATION_LIVE = int(os.getenv("CACHE_DURATION_LIVE", 2 * 60))       # 2 min (Para detetar lives rápido)
+
+CACHE_HARD_TTL_VIDEOS = int(os.getenv("CACHE_HARD_TTL_VIDEOS", 6 * 60 * 60))  # 6 h
+CACHE_HARD_TTL_NEWS = int(os.getenv("CACHE_HARD_TTL_NEWS", 2 * 60 * 60))      # 2 h
+CACHE_HARD_TTL_LIVE = int(os.getenv("CACHE_HARD_TTL_LIVE", 10 * 60))          # 10 min (uma live antiga engana)
+
+DEFAULT_VIDEOS_LIMIT = 6
+MAX_VIDEOS_LIMIT = 12  # A cache guarda sempre esta quantidade; cada pedido recebe a sua fatia
+
+
+def _api_ok(data):
+    return isinstance(data, dict) and "error" not in data
+
+
+# A nossa "Base de Dados" na memória RAM
+cache = SWRCache()
+cache.configure("channel", CachePolicy(CACHE_DURATION_VIDEOS, CACHE_HARD_TTL_VIDEOS), get_channel_info, _api_ok)
+cache.configure("live", CachePolicy(CACHE_DURATION_LIVE, CACHE_HARD_TTL_LIVE), get_live_status, _api_ok)
+cache.configure(
+    "videos",
+    CachePolicy(CACHE_DURATION_VIDEOS, CACHE_HARD_TTL_VIDEOS),
+    lambda: get_latest_videos(MAX_VIDEOS_LIMIT),
+    _api_ok,
+)
+cache.configure("news", CachePolicy(CACHE_DURATION_NEWS, CACHE_HARD_TTL_NEWS), get_simracing_news)
+
+
+def refresh_stale_cache():
+    """Tarefa do agendador (main.py): atualiza em background as chaves expiradas que têm visitas."""
+    cache.refresh_due()
+
+# ============================================================
+# 🚦 ROTAS (Com Proteção de Cache)
+# ============================================================
+
+@youtube_bp.route("/channel-info", methods=["GET"])
+def channel_info():
+    # Cache primeiro; a API só é chamada se não houver nada para servir
+    data, ok = cache.get("channel")
+    if ok:
+        return jsonify(data)
+    return jsonify(data or {"error": "Falha ao obter o canal"}), 500
+
+@youtube_bp.route("/live-status", methods=["GET"])
+def live_status():
+    data, ok = cache.get("live")
+    if ok:
+        return jsonify(data)
+    return jsonify(data or {"error": "Falha ao obter o estado da live"}), 500
+
+@youtube_bp.route("/latest-videos", methods=["GET"])
+def latest_videos():
+    limit = request.args.get("limit", DEFAULT_VIDEOS_LIMIT, type=int) or DEFAULT_VIDEOS_LIMIT
+    limit = max(1, min(limit, MAX_VIDEOS_LIMIT))
+
+    # Uma só entrada na cache (sempre MAX_VIDEOS_LIMIT vídeos): o 'limit' de um visitante
+    # não muda o que o refresh em background vai buscar para os outros
+    data, ok = cache.get("videos")
+    if ok:
+        return jsonify({**data, "videos": data["videos"][:limit]})
+    return jsonify(data or {"error": "Falha ao obter vídeos"}), 500
+
+@youtube_bp.route("/simracing-news", methods=["GET"])
+def simracing_news():
+    data, ok = cache.get("news")
+    if ok:
+        return jsonify(data)
+    return jsonify({"error": "Falha ao obter notícias"}), 500
+
+@youtube_bp.route("/news-health", methods=["GET"])
+def news_health():
+    """Latência, erros, circuit breaker e próximo pedido de cada fonte de notícias."""
+    try:
+        return jsonify({"feeds": get_feeds_health()})
+    except Exception as e:
+        print(f"Erro saúde das notícias: {e}")
+        return jsonify({"error": "Falha ao obter o estado das fontes"}), 500
+
+@youtube_bp.route("/http-metrics", methods=["GET"])
+def external_http_metrics():
+    """Tempos e erros das chamadas às APIs externas (por endpoint)."""
+    return jsonify(http_metrics())
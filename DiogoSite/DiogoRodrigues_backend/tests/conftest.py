@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend imports itself as `src.…`, so the tests run from DiogoRodrigues_backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
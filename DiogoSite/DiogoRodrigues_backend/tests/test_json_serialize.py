@@ -0,0 +1,116 @@
+"""
+The column-wise serializer and json_response against the original path,
+make_json_serializable(df.to_dict('records')) encoded by jsonify.
+"""
+
+import json
+import math
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, jsonify
+
+from src.utils.json_serialize import dataframe_to_columns, dataframe_to_records, json_response, make_json_serializable
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+def telemetry_frame(rows=500, seed=0):
+    """Wide frame shaped like LMU "Vehicle Telemetry" output from DuckDB .df()."""
+    rng = np.random.default_rng(seed)
+    ts = np.arange(rows) * 0.01
+    df = pd.DataFrame({
+        "ts": ts,
+        "Speed": rng.normal(180, 40, rows),
+        "RPM": rng.integers(3000, 9000, rows),
+        "Gear": rng.integers(1, 7, rows).astype("int8"),
+        "InPits": rng.random(rows) < 0.01,
+        "when": pd.Timestamp("2025-01-01") + pd.to_timedelta(ts, unit="s"),
+    })
+    df.loc[::7, "Speed"] = np.nan
+    df.loc[::11, "when"] = pd.NaT
+    return df
+
+
+def special_frame():
+    """NaN/inf floats, numpy scalars inside object columns and pandas NA values."""
+    return pd.DataFrame({
+        "float": [1.5, np.nan, np.inf, -np.inf],
+        "objects": pd.Series([np.float64(2.5), np.float64("nan"), np.int64(7), np.bool_(True)], dtype=object),
+        "nullable": pd.array([1, None, 3, None], dtype="Int64"),
+        "text": ["a", None, "c", pd.NA],
+        "when": pd.to_datetime(
+            ["2025-01-01 00:00:00", None, "2025-01-02 10:00:00.5", "2025-01-03 00:00:00.000000001"], format="ISO8601"
+        ),
+    })
+
+
+def original_records(df):
+    return make_json_serializable(df.to_dict("records"))
+
+
+def finite_or_none(data):
+    """Non-finite floats as json_response writes them (null)."""
+    if isinstance(data, dict):
+        return {key: finite_or_none(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [finite_or_none(value) for value in data]
+    if isinstance(data, float) and not math.isfinite(data):
+        return None
+    return data
+
+
+def test_records_match_original_path():
+    df = telemetry_frame()
+    assert dataframe_to_records(df) == original_records(df)
+
+
+def test_special_values_match_original_path():
+    # The original path keeps numpy NaN/inf as floats; both encode them as null
+    df = special_frame()
+    assert finite_or_none(dataframe_to_records(df)) == finite_or_none(original_records(df))
+
+
+def test_columns_hold_the_same_values_as_records():
+    df = telemetry_frame(50)
+    columns = dataframe_to_columns(df)
+    records = dataframe_to_records(df)
+    assert list(columns) == list(df.columns)
+    assert [dict(zip(columns, row)) for row in zip(*columns.values())] == records
+
+
+def test_empty_frame():
+    assert dataframe_to_records(pd.DataFrame({"a": pd.Series([], dtype=float)})) == []
+
+
+def test_encoded_body_matches_jsonify(app):
+    for df in (telemetry_frame(), special_frame()):
+        expected = finite_or_none(json.loads(jsonify(original_records(df)).get_data()))
+        assert json.loads(json_response(dataframe_to_records(df)).get_data()) == expected
+
+
+def test_numpy_scalars_stay_numbers(app):
+    scalars = {"f": np.float32(0.5), "i": np.int16(3), "b": np.bool_(False), "nan": np.float64("nan")}
+    assert json.loads(json_response(scalars).get_data()) == {"f": 0.5, "i": 3, "b": False, "nan": None}
+
+
+def test_flask_types_encode_like_jsonify(app):
+    payload = {"d": Decimal("1.10"), "day": date(2025, 1, 1)}
+    assert json.loads(json_response(payload).get_data()) == json.loads(jsonify(payload).get_data())
+
+
+def test_unknown_types_raise(app):
+    with pytest.raises(TypeError):
+        json_response({"unknown": object()})
+
+
+def test_status_code(app):
+    assert json_response({"error": "nope"}, 404).status_code == 404
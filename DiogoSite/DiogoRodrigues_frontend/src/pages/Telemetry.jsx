@@ -77,13 +77,18 @@ const Telemetry = () => {
     setQueryResult(null);
 
     try {
-      const data = await runTelemetryQuery(tempFilename, queryToRun); // Usa a função do serviço
+      const { rows: data, truncated, rowLimit } = await runTelemetryQuery(tempFilename, queryToRun); // Usa a função do serviço
       
       // Se estamos a listar tabelas, preenche o state dbTables
       if (queryToRun.trim().toUpperCase() === 'SHOW ALL TABLES;') {
         setDbTables(data);
       } else {
-        setQueryResult({ title: title || `Resultado para: ${queryToRun}`, data });
+        // O servidor corta resultados grandes; o título avisa que faltam linhas
+        const resultTitle = title || `Resultado para: ${queryToRun}`;
+        setQueryResult({
+          title: truncated ? `${resultTitle} (só as primeiras ${rowLimit} linhas)` : resultTitle,
+          data,
+        });
       }
 
     } catch (err) {
@@ -22,12 +22,28 @@ export async function getLatestVideos() {
   return res.json();
 }
 
+/**
+ * Acrescenta pista, carro e tipo de sessão (se conhecidos) ao formulário do upload.
+ * Sem eles (e sem tabela `metadata` no ficheiro) a sessão fica no histórico como "unknown".
+ * @param {FormData} formData O formulário do upload.
+ * @param {{track?: string, car?: string, sessionType?: string}} metadata
+ * @returns {FormData} O mesmo formulário.
+ */
+function appendSessionMetadata(formData, metadata = {}) {
+  for (const key of ['track', 'car', 'sessionType']) {
+    if (metadata[key]) formData.set(key, metadata[key]);
+  }
+  return formData;
+}
+
 /**
  * Envia um ficheiro de telemetria para análise inicial.
  * @param {FormData} formData O formulário de dados contendo o ficheiro.
+ * @param {{track?: string, car?: string, sessionType?: string}} [metadata] Pista/carro/sessão para o histórico.
  * @returns {Promise<object>} Os dados da análise inicial (voltas, etc.).
  */
-export async function analyzeTelemetry(formData) {
+export async function analyzeTelemetry(formData, metadata = {}) {
+  appendSessionMetadata(formData, metadata);
   const res = await fetch(`${BACKEND_URL}/api/telemetry/analyze`, {
     method: 'POST',
     body: formData,
@@ -52,7 +68,8 @@ export async function analyzeTelemetry(formData) {
  * Executa uma query SQL no ficheiro de telemetria especificado.
  * @param {string} filename O nome do ficheiro no servidor.
  * @param {string} query A query SQL a ser executada.
- * @returns {Promise<object>} O resultado da query.
+ * @returns {Promise<{rows: object[], truncated: boolean, rowLimit: number|null}>} As linhas do resultado;
+ *   `truncated` indica que o servidor as cortou em `rowLimit` linhas (`TELEMETRY_QUERY_MAX_ROWS`).
  */
 export async function runTelemetryQuery(filename, query) {
   const res = await fetch(`${BACKEND_URL}/api/telemetry/query`, {
@@ -65,5 +82,251 @@ export async function runTelemetryQuery(filename, query) {
     console.error("Falha na query de telemetria:", res.status, errorData);
     throw new Error(errorData.error || `Erro ${res.status}`);
   }
+  const truncated = res.headers.get('X-Result-Truncated') === 'true';
+  const rowLimit = truncated ? Number(res.headers.get('X-Result-Row-Limit')) : null;
+  if (truncated) {
+    console.warn(`Resultado da query cortado nas primeiras ${rowLimit} linhas:`, query);
+  }
+  return { rows: await res.json(), truncated, rowLimit };
+}
+
+
+/**
+ * Obtém estatísticas por volta (mín, máx, média, percentis) dos canais escolhidos.
+ * @param {string} filename O nome do ficheiro no servidor.
+ * @param {string[]} [channels] Canais a agregar (por omissão: velocidade, acelerador, travão e volante).
+ * @returns {Promise<object>} `{ channels, laps }` com as estatísticas de cada volta.
+ */
+export async function getLapStats(filename, channels) {
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/laps/stats`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename, channels }),
+  });
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha nas estatísticas por volta:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
+  return res.json();
+}
+
+
+/**
+ * Obtém o relatório de voltas: parciais por setor, diagnóstico de validade, volta teórica e consistência.
+ * @param {string} filename O nome do ficheiro no servidor.
+ * @returns {Promise<object>} `{ laps, bestSectors, theoreticalBest, consistency }`.
+ */
+export async function getLapReport(filename) {
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/laps/report`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename }),
+  });
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha no relatório de voltas:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
+  return res.json();
+}
+
+
+/**
+ * Obtém a análise de stints: paragens nas boxes, degradação dos pneus, consistência e voltas anómalas.
+ * @param {string} filename O nome do ficheiro no servidor.
+ * @param {{window?: number, outlierThreshold?: number}} [options] Janela da consistência (voltas) e limite do z-score robusto.
+ * @returns {Promise<object>} `{ pitSource, laps, stints }`.
+ */
+export async function getStintAnalysis(filename, options = {}) {
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/stints`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename, ...options }),
+  });
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha na análise de stints:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
+  return res.json();
+}
+
+
+/**
+ * Envia um ficheiro de telemetria em blocos (upload retomável) e devolve a mesma análise que `analyzeTelemetry`.
+ * Se um bloco falhar, pergunta ao servidor quantos bytes recebeu e continua a partir daí.
+ * @param {File} file O ficheiro .duckdb.
+ * @param {(sent: number, total: number) => void} [onProgress] Callback de progresso.
+ * @param {number} [maxRetries] Tentativas por bloco antes de desistir.
+ * @param {{track?: string, car?: string, sessionType?: string}} [metadata] Pista/carro/sessão para o histórico.
+ * @returns {Promise<object>} Os dados da análise inicial (voltas, etc.).
+ */
+export async function uploadTelemetryChunked(file, onProgress, maxRetries = 3, metadata = {}) {
+  const readJson = async (res, label) => {
+    const data = await res.json();
+    if (!res.ok) {
+      console.error(`Falha no upload (${label}):`, res.status, data);
+      throw Object.assign(new Error(data.error || `Erro ${res.status}`), { status: res.status, data });
+    }
+    return data;
+  };
+
+  const init = await readJson(await fetch(`${BACKEND_URL}/api/telemetry/upload/init`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size }),
+  }), 'init');
+
+  const uploadUrl = `${BACKEND_URL}/api/telemetry/upload/${init.upload_id}`;
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + init.chunk_size);
+    try {
+      const res = await fetch(`${uploadUrl}?offset=${offset}`, { method: 'PUT', body: chunk });
+      offset = (await readJson(res, 'chunk')).received;
+      retries = 0;
+      if (onProgress) onProgress(offset, file.size);
+    } catch (err) {
+      if (++retries > maxRetries) throw err;
+      // Retoma a partir dos bytes que o servidor confirma ter recebido
+      offset = (await readJson(await fetch(uploadUrl), 'status')).received;
+    }
+  }
+
+  return readJson(await fetch(`${uploadUrl}/finalize`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(metadata),
+  }), 'finalize');
+}
+
+
+/**
+ * Obtém séries reduzidas (LTTB ou mín/máx por intervalo) para gráficos de telemetria.
+ * @param {string} filename O nome do ficheiro no servidor.
+ * @param {object} options `{ channels, lap | start/end, points, method }`.
+ * @returns {Promise<object>} `{ channels: { [canal]: { ts, value, rawCount } } }`.
+ */
+export async function getDownsampledChannels(filename, options) {
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/downsample`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename, ...options }),
+  });
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha ao reduzir canais de telemetria:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
+  return res.json();
+}
+
+
+/**
+ * Compara várias voltas alinhadas pela distância (delta de tempo e sobreposição de canais).
+ * @param {string} filename O nome do ficheiro no servidor.
+ * @param {number[]} laps Voltas a comparar (a primeira é a referência, salvo `options.reference`).
+ * @param {object} [options] `{ channels, step, reference, distanceChannel }`.
+ * @returns {Promise<object>} `{ distance, reference, laps: { [volta]: { time, delta, channels } } }`.
+ */
+export async function compareLaps(filename, laps, options = {}) {
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/laps/compare`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename, laps, ...options }),
+  });
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha na comparação de voltas:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
+  return res.json();
+}
+
+
+/**
+ * Melhores voltas guardadas no histórico de sessões (se o histórico estiver ativo no servidor).
+ * @param {object} [filters] `{ track, car, days, sessionType, limit }`.
+ * @returns {Promise<object[]>} Lista das voltas mais rápidas.
+ */
+export async function getBestLapsHistory(filters = {}) {
+  const params = new URLSearchParams(
+    Object.entries(filters).filter(([, value]) => value !== undefined && value !== null && value !== '')
+  );
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/history/best-laps?${params}`);
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha ao obter o histórico de voltas:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
+  return res.json();
+}
+
+
+/**
+ * Envia um ficheiro de telemetria para análise em background.
+ * @param {FormData} formData O formulário com o ficheiro (`telemetryFile`).
+ * @param {{track?: string, car?: string, sessionType?: string}} [metadata] Pista/carro/sessão para o histórico.
+ * @returns {Promise<object>} O estado inicial do trabalho (`jobId`, `status`, `temp_filename`).
+ */
+export async function startTelemetryJob(formData, metadata = {}) {
+  appendSessionMetadata(formData, metadata);
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/jobs`, {
+    method: 'POST',
+    body: formData,
+  });
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha ao iniciar a análise:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
+  return res.json();
+}
+
+
+/**
+ * Acompanha um trabalho de análise por Server-Sent Events até terminar.
+ * @param {string} jobId O id devolvido por `startTelemetryJob`.
+ * @param {(state: object) => void} onUpdate Chamada a cada mudança de estado (progresso, voltas no fim).
+ * @returns {() => void} Função para deixar de acompanhar.
+ */
+export function watchTelemetryJob(jobId, onUpdate) {
+  const source = new EventSource(`${BACKEND_URL}/api/telemetry/jobs/${jobId}/events`);
+  source.onmessage = (event) => {
+    const state = JSON.parse(event.data);
+    onUpdate(state);
+    if (['done', 'failed', 'timeout', 'cancelled'].includes(state.status)) {
+      source.close();
+    }
+  };
+  // O trabalho deixou de existir (ficheiro apagado ou id inválido): não vale a pena religar
+  source.addEventListener('gone', (event) => {
+    console.error("Falha ao acompanhar a análise:", jobId, JSON.parse(event.data).error);
+    source.close();
+  });
+  source.onerror = () => {
+    // O servidor fecha cada resposta de propósito; só é falha se o EventSource desistir de religar
+    if (source.readyState === EventSource.CLOSED) {
+      console.error("Falha ao acompanhar a análise:", jobId);
+    }
+  };
+  return () => source.close();
+}
+
+
+/**
+ * Cancela um trabalho de análise em curso.
+ * @param {string} jobId O id do trabalho.
+ * @returns {Promise<object>} O estado do trabalho.
+ */
+export async function cancelTelemetryJob(jobId) {
+  const res = await fetch(`${BACKEND_URL}/api/telemetry/jobs/${jobId}`, { method: 'DELETE' });
+  if (!res.ok) {
+    const errorData = await res.json();
+    console.error("Falha ao cancelar a análise:", res.status, errorData);
+    throw new Error(errorData.error || `Erro ${res.status}`);
+  }
   return res.json();
 }